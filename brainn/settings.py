@@ -127,11 +127,25 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Uploaded files (statements queued for import)
+MEDIA_ROOT = BASE_DIR / 'media'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Analytics responses are cached per user and invalidated through a data
+# version (see trading_journal/cache.py). Every web worker and the import
+# worker must see the same version, so the backend has to be shared between
+# processes: the file backend on one host, or memcached or Redis across hosts.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+    }
+}
+
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
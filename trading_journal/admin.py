@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import TradeRule, Tag, Trade
+from .models import TradeRule, Tag, Trade, ImportJob, OpenLot
 
 @admin.register(TradeRule)
 class TradeRuleAdmin(admin.ModelAdmin):
@@ -42,3 +42,15 @@ class TradeAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('original_name', 'user', 'status', 'rows_parsed', 'trades_created', 'created_at')
+    list_filter = ('status', 'user')
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'heartbeat_at')
+
+@admin.register(OpenLot)
+class OpenLotAdmin(admin.ModelAdmin):
+    list_display = ('position_key', 'user', 'side', 'quantity', 'price', 'opened_at')
+    list_filter = ('instrument_type', 'user')
+    search_fields = ('ticker_symbol', 'position_key')
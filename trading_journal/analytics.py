@@ -0,0 +1,222 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+NO_DRAWDOWN = {'amount': 0.0, 'peak_index': None, 'trough_index': None, 'trades': 0, 'seconds': 0}
+
+
+def longest_streak(mask):
+    """Length of the longest run of True values in a boolean array."""
+    if not mask.any():
+        return 0
+    # Pad with False so every run has a start and an end edge
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    return int((ends - starts).max())
+
+
+def max_drawdown(equity, times):
+    """Largest peak-to-trough fall of an equity curve that starts at zero.
+
+    Returns the drawdown amount, the indices of its peak and trough, and how
+    long the curve stayed under that peak: in trades, and in seconds until it
+    recovered or until the last trade when it never did.
+    """
+    peaks = np.maximum.accumulate(np.concatenate(([0.0], equity)))[1:]
+    drawdown = peaks - equity
+    trough = int(drawdown.argmax())
+    amount = round(float(drawdown[trough]), 2)
+    if amount <= 0:
+        return dict(NO_DRAWDOWN)
+
+    # The peak is the last point at the running high before the trough; -1
+    # means the high is the starting balance, before the first trade
+    at_high = np.flatnonzero(equity[:trough] >= peaks[trough])
+    peak = int(at_high[-1]) if len(at_high) else -1
+    recovered = np.flatnonzero(equity[trough:] >= peaks[trough])
+    end = trough + int(recovered[0]) if len(recovered) else len(equity) - 1
+    start_time = times[max(peak, 0)]
+    return {
+        'amount': amount,
+        'peak_index': peak if peak >= 0 else None,
+        'trough_index': trough,
+        'trades': end - peak,
+        'seconds': int((times[end] - start_time) / np.timedelta64(1, 's')),
+    }
+
+
+def equity_curve(times, pnl):
+    """Summarize a chronological series of closed-trade P&L.
+
+    times is an array of datetime64 values and pnl the matching net P&L per
+    trade. Sharpe and Sortino are per trade and not annualized, since trades
+    are not evenly spaced in time.
+    """
+    pnl = np.asarray(pnl, dtype=np.float64)
+    times = np.asarray(times, dtype='datetime64[s]')
+    count = len(pnl)
+    if count == 0:
+        return {
+            'times': [], 'equity': [], 'drawdown': [], 'total_trades': 0,
+            'net_pnl': 0.0, 'expectancy': 0.0, 'sharpe': None, 'sortino': None,
+            'max_drawdown': dict(NO_DRAWDOWN),
+            'longest_win_streak': 0, 'longest_loss_streak': 0,
+        }
+
+    equity = np.cumsum(pnl)
+    peaks = np.maximum.accumulate(np.concatenate(([0.0], equity)))[1:]
+    std = pnl.std(ddof=1) if count > 1 else 0.0
+    downside = np.sqrt(np.mean(np.minimum(pnl, 0.0) ** 2))
+    mean = pnl.mean()
+
+    return {
+        'times': np.datetime_as_string(times, unit='s').tolist(),
+        'equity': np.round(equity, 2).tolist(),
+        'drawdown': np.round(equity - peaks, 2).tolist(),
+        'total_trades': count,
+        'net_pnl': round(float(equity[-1]), 2),
+        # Average result per trade, i.e. win rate * average win - loss rate * average loss
+        'expectancy': round(float(mean), 2),
+        'sharpe': round(float(mean / std), 4) if std > 0 else None,
+        'sortino': round(float(mean / downside), 4) if downside > 0 else None,
+        'max_drawdown': max_drawdown(equity, times),
+        'longest_win_streak': longest_streak(pnl > 0),
+        'longest_loss_streak': longest_streak(pnl < 0),
+    }
+
+
+def lttb(x, y, threshold):
+    """Indices of the points kept by Largest-Triangle-Three-Buckets downsampling.
+
+    The first and last points are always kept. The points in between are
+    split into threshold - 2 buckets and from each one the point forming the
+    largest triangle with the previously kept point and the average of the
+    next bucket is chosen, which preserves peaks and troughs of the series.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    count = len(x)
+    if threshold >= count or threshold < 3:
+        return np.arange(count)
+
+    edges = np.linspace(1, count - 1, threshold - 1).astype(np.int64)
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0] = 0
+    kept[-1] = count - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_x = x[end:edges[bucket + 2]].mean()
+            next_y = y[end:edges[bucket + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        # Twice the triangle area; the constant factor does not change the argmax
+        area = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(area.argmax())
+        kept[bucket + 1] = previous
+    return kept
+
+
+# Simulated trades (paths x trades) held in memory by one chunk of work
+MONTE_CARLO_CHUNK_CELLS = 2_000_000
+# Below this many cells the process pool costs more than it saves
+MONTE_CARLO_POOL_CELLS = 4_000_000
+# Processes shared by every simulation in this process
+MONTE_CARLO_WORKERS = min(4, os.cpu_count() or 1)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _shared_pool():
+    """The process pool for large simulations, started on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=MONTE_CARLO_WORKERS)
+        return _pool
+
+
+def _discard_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def simulate_chunk(pnl, paths, trades, seed, starting_equity, ruin_equity):
+    """Resample per-trade P&L into paths equity curves of trades trades each.
+
+    Returns each path's ending equity, its largest drawdown and whether it
+    ever fell to ruin_equity.
+    """
+    rng = np.random.default_rng(seed)
+    equity = starting_equity + np.cumsum(rng.choice(pnl, size=(paths, trades)), axis=1)
+    peaks = np.maximum(np.maximum.accumulate(equity, axis=1), starting_equity)
+    return (
+        equity[:, -1],
+        (peaks - equity).max(axis=1),
+        (equity <= ruin_equity).any(axis=1),
+    )
+
+
+def _simulate_chunk(arguments):
+    return simulate_chunk(*arguments)
+
+
+def monte_carlo(pnl, simulations=1000, trades=None, seed=0, starting_equity=10000.0, ruin_fraction=0.5):
+    """Distribution of outcomes from resampling historical per-trade P&L.
+
+    Paths are split into chunks, each with its own child of
+    SeedSequence(seed), so the result depends only on the arguments and not
+    on how many processes ran it. Large simulations are spread over a
+    process pool of MONTE_CARLO_WORKERS processes that all requests share.
+    """
+    pnl = np.asarray(pnl, dtype=np.float64)
+    trades = trades or len(pnl)
+    ruin_equity = starting_equity * (1 - ruin_fraction)
+
+    per_chunk = max(1, MONTE_CARLO_CHUNK_CELLS // trades)
+    sizes = [min(per_chunk, simulations - start) for start in range(0, simulations, per_chunk)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    chunks = [(pnl, size, trades, child, starting_equity, ruin_equity) for size, child in zip(sizes, seeds)]
+
+    results = None
+    if len(chunks) > 1 and simulations * trades >= MONTE_CARLO_POOL_CELLS:
+        pool = _shared_pool()
+        try:
+            results = list(pool.map(_simulate_chunk, chunks))
+        except BrokenProcessPool:
+            # A worker died; start a new pool next time and finish this one here
+            _discard_pool(pool)
+    if results is None:
+        results = [simulate_chunk(*chunk) for chunk in chunks]
+
+    ending = np.concatenate([result[0] for result in results])
+    drawdown = np.concatenate([result[1] for result in results])
+    ruined = np.concatenate([result[2] for result in results])
+    percentiles = [5, 25, 50, 75, 95]
+    return {
+        'simulations': simulations,
+        'trades_per_path': trades,
+        'starting_equity': starting_equity,
+        'ending_equity': {
+            'mean': round(float(ending.mean()), 2),
+            **{f'p{p}': round(float(v), 2) for p, v in zip(percentiles, np.percentile(ending, percentiles))},
+        },
+        'max_drawdown': {
+            f'p{p}': round(float(v), 2) for p, v in zip([50, 75, 95, 99], np.percentile(drawdown, [50, 75, 95, 99]))
+        },
+        'probability_of_profit': round(float((ending > starting_equity).mean()), 4),
+        'probability_of_ruin': round(float(ruined.mean()), 4),
+        'ruin_equity': ruin_equity,
+    }
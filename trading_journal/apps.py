@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TradingJournalConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'trading_journal'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
@@ -0,0 +1,72 @@
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+
+from django.utils import timezone
+
+
+def measure(run, repeat):
+    """Return the best wall time over repeat runs and the peak traced memory of one run."""
+    seconds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = run()
+        seconds.append(time.perf_counter() - started)
+
+    # Tracing slows everything down, so memory gets a run of its own
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    best = min(seconds)
+    return {
+        'seconds': round(best, 4),
+        'peak_mb': round(peak / 1024 / 1024, 2),
+        'rows': rows,
+        'rows_per_sec': round(rows / best) if best else None,
+    }
+
+
+def revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(command, results, output=None, compare=None):
+    """Write a benchmark command's results as JSON and compare them with an earlier run."""
+    if output:
+        with open(output, 'w') as output_file:
+            json.dump({
+                'revision': revision(),
+                'created_at': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'cpu_count': os.cpu_count(),
+                'results': results,
+            }, output_file, indent=2)
+        command.stdout.write(command.style.SUCCESS(f'Results written to {output}'))
+    if compare:
+        _compare(command, compare, results)
+
+
+def _compare(command, path, results):
+    with open(path) as baseline_file:
+        baseline = json.load(baseline_file)
+    previous = {(r['benchmark'], r['size']): r for r in baseline['results']}
+    command.stdout.write(f"Compared with {baseline.get('revision') or path}:")
+    for result in results:
+        before = previous.get((result['benchmark'], result['size']))
+        if not before:
+            continue
+        time_change = (result['seconds'] - before['seconds']) / before['seconds'] * 100
+        memory_change = result['peak_mb'] - before['peak_mb']
+        line = (f"{result['benchmark']:<10} {result['size']:>9}  time {time_change:+7.1f}%  "
+                f"peak memory {memory_change:+8.2f} MB")
+        command.stdout.write(command.style.ERROR(line) if time_change > 10 else line)
@@ -0,0 +1,248 @@
+from copy import copy
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .cache import bump_version, data_version
+from .importers import NATURAL_KEY, existing_keys, natural_key
+from .models import Tag, Trade, TradeRule
+from .rolling import record_trades
+from .rollups import paused, refresh_days, trading_day
+from .serializers import BulkTradeSerializer
+
+BATCH_SIZE = 500
+
+# Trade relation -> (prefix of its id lists, related model, the related model's owner field)
+RELATIONS = {
+    'tags': ('tag', Tag, 'created_by'),
+    'rules_followed': ('rule', TradeRule, 'user'),
+}
+LINK_KEYS = {
+    f'{action}{prefix}_ids'
+    for prefix, _, _ in RELATIONS.values()
+    for action in ('', 'add_', 'remove_')
+}
+
+
+def _error(index, errors, trade_id=None):
+    result = {'index': index, 'status': 'error', 'errors': errors}
+    if trade_id is not None:
+        result['trade_id'] = trade_id
+    return result
+
+
+def _check_links(user, validated):
+    """Errors for tag and rule ids the user does not own, keyed by item index.
+
+    Costs one query per relation for the whole batch.
+    """
+    errors = {}
+    for prefix, model, owner in RELATIONS.values():
+        keys = [f'{prefix}_ids', f'add_{prefix}_ids', f'remove_{prefix}_ids']
+        wanted = {pk for data in validated.values() for key in keys for pk in data.get(key, [])}
+        if not wanted:
+            continue
+        owned = set(model.objects.filter(**{owner: user, 'pk__in': wanted}).values_list('pk', flat=True))
+        for index, data in validated.items():
+            for key in keys:
+                missing = [pk for pk in data.get(key, []) if pk not in owned]
+                if missing:
+                    errors.setdefault(index, {})[key] = [
+                        f'Invalid pk "{pk}" - object does not exist.' for pk in missing
+                    ]
+    return errors
+
+
+def _write_links(changes):
+    """Write link changes straight to the Trade.tags and rules_followed through tables.
+
+    changes is a list of (trade_id, validated data) pairs. Replaced and
+    removed links go in one DELETE per relation, new ones in one bulk insert.
+    """
+    for relation, (prefix, _, _) in RELATIONS.items():
+        field = Trade._meta.get_field(relation)
+        through = field.remote_field.through
+        source, target = field.m2m_column_name(), field.m2m_reverse_name()
+
+        replaced = [trade_id for trade_id, data in changes if f'{prefix}_ids' in data]
+        removed = {}
+        for trade_id, data in changes:
+            for pk in data.get(f'remove_{prefix}_ids', []):
+                removed.setdefault(pk, []).append(trade_id)
+        stale = Q(**{f'{source}__in': replaced}) if replaced else Q()
+        for pk, trade_ids in removed.items():
+            stale |= Q(**{target: pk, f'{source}__in': trade_ids})
+        if stale:
+            through.objects.filter(stale).delete()
+
+        links = [
+            through(**{source: trade_id, target: pk})
+            for trade_id, data in changes
+            for pk in set(data.get(f'{prefix}_ids', [])) | set(data.get(f'add_{prefix}_ids', []))
+        ]
+        through.objects.bulk_create(links, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def create_trades(user, items):
+    """Validate and insert a batch of trades with their tag and rule links.
+
+    Items that fail validation, or repeat the natural key of an existing or
+    earlier trade, are reported and left out; the rest are written with
+    bulk_create in one transaction. Returns one result per item, in order.
+    """
+    results = [None] * len(items)
+    validated = {}
+    for index, item in enumerate(items):
+        serializer = BulkTradeSerializer(data=item)
+        if serializer.is_valid():
+            validated[index] = serializer.validated_data
+        else:
+            results[index] = _error(index, serializer.errors)
+    for index, errors in _check_links(user, validated).items():
+        results[index] = _error(index, errors)
+        del validated[index]
+
+    trades = {}
+    for index, data in validated.items():
+        trade = Trade(user=user, **{name: value for name, value in data.items() if name not in LINK_KEYS})
+        trade.calculate_profit_loss()
+        trades[index] = trade
+
+    # Open trades have no exit yet, so several may legitimately share an entry
+    closed = [trade for trade in trades.values() if trade.exit_date is not None]
+    if closed:
+        existing = existing_keys(user, closed)
+        for index, trade in list(trades.items()):
+            if trade.exit_date is None:
+                continue
+            if natural_key(trade) in existing:
+                results[index] = _error(index, {'non_field_errors': ['This trade already exists.']})
+                del trades[index]
+            else:
+                existing.add(natural_key(trade))
+
+    if trades:
+        previous_version = data_version(user.pk)
+        with transaction.atomic(), paused():
+            Trade.objects.bulk_create(trades.values(), batch_size=BATCH_SIZE)
+            _write_links([(trade.pk, validated[index]) for index, trade in trades.items()])
+            refresh_days(user, {trading_day(trade.entry_date) for trade in trades.values()})
+        version = bump_version(user.pk)
+        record_trades(user.pk, trades.values(), previous_version, version)
+        for index, trade in trades.items():
+            results[index] = {'index': index, 'status': 'created', 'trade_id': trade.pk}
+    return results
+
+
+def update_trades(user, items):
+    """Apply partial updates, each naming its trade_id, to a batch of the user's trades.
+
+    Fields are validated as for a PATCH, then written with a single
+    bulk_update. Items that would give their trade the natural key of
+    another trade, or of one an earlier item moved, are reported and left
+    out. tag_ids and rule_ids replace a trade's links, while add_tag_ids,
+    remove_tag_ids, add_rule_ids and remove_rule_ids edit them. Returns one
+    result per item, in order.
+    """
+    results = [None] * len(items)
+    ids = [item.get('trade_id') for item in items if isinstance(item, dict)]
+    trades = Trade.objects.filter(user=user).in_bulk([pk for pk in ids if isinstance(pk, int)])
+
+    validated = {}
+    for index, item in enumerate(items):
+        trade_id = item.get('trade_id') if isinstance(item, dict) else None
+        if not isinstance(trade_id, int) or trade_id not in trades:
+            results[index] = _error(index, {'trade_id': ['Not found.']}, trade_id)
+            continue
+        serializer = BulkTradeSerializer(trades[trade_id], data=item, partial=True)
+        if serializer.is_valid():
+            validated[index] = serializer.validated_data
+        else:
+            results[index] = _error(index, serializer.errors, trade_id)
+    for index, errors in _check_links(user, validated).items():
+        results[index] = _error(index, errors, items[index]['trade_id'])
+        del validated[index]
+
+    if not validated:
+        return results
+
+    # Natural keys of the user's trades around the dates involved; each
+    # item's new key is checked against these and the earlier items'
+    entry_dates = [trade.entry_date for trade in trades.values()] + [
+        data['entry_date'] for data in validated.values() if 'entry_date' in data
+    ]
+    occupied = {
+        tuple(key): pk
+        for pk, *key in Trade.objects.filter(
+            user=user,
+            entry_date__gte=min(entry_dates),
+            entry_date__lte=max(entry_dates)
+        ).order_by().values_list('pk', *NATURAL_KEY)
+    }
+
+    now = timezone.now()
+    fields = {'updated_at', 'profit_loss', 'is_win'}
+    changed = {}
+    for index, data in list(validated.items()):
+        trade_id = items[index]['trade_id']
+        current = changed.get(trade_id, trades[trade_id])
+        trade = copy(current)
+        names = {name for name in data if name not in LINK_KEYS}
+        for name in names:
+            setattr(trade, name, data[name])
+
+        key = natural_key(trade)
+        # The database treats open trades (no exit date) as never equal
+        if trade.exit_date is not None and occupied.get(key, trade_id) != trade_id:
+            results[index] = _error(index, {'non_field_errors': ['This trade already exists.']}, trade_id)
+            del validated[index]
+            continue
+        if occupied.get(natural_key(current)) == trade_id:
+            del occupied[natural_key(current)]
+        occupied[key] = trade_id
+
+        trade.calculate_profit_loss()
+        trade.updated_at = now
+        fields |= names
+        changed[trade_id] = trade
+
+    if not changed:
+        return results
+
+    days = set()
+    for trade_id, trade in changed.items():
+        days.add(trading_day(trades[trade_id].entry_date))
+        days.add(trading_day(trade.entry_date))
+
+    with transaction.atomic(), paused():
+        Trade.objects.bulk_update(changed.values(), sorted(fields), batch_size=BATCH_SIZE)
+        _write_links([(items[index]['trade_id'], data) for index, data in validated.items()])
+        refresh_days(user, days)
+    bump_version(user.pk)
+    for index in validated:
+        results[index] = {'index': index, 'status': 'updated', 'trade_id': items[index]['trade_id']}
+    return results
+
+
+def delete_trades(user, trade_ids):
+    """Delete the given trades of the user, with their links, in one transaction.
+
+    Returns one result per id, in order.
+    """
+    found = dict(
+        Trade.objects.filter(
+            user=user, pk__in=[pk for pk in trade_ids if isinstance(pk, int)]
+        ).values_list('pk', 'entry_date')
+    )
+    results = [
+        {'index': index, 'status': 'deleted', 'trade_id': pk} if isinstance(pk, int) and pk in found
+        else _error(index, {'trade_id': ['Not found.']}, pk)
+        for index, pk in enumerate(trade_ids)
+    ]
+    if found:
+        with transaction.atomic(), paused():
+            Trade.objects.filter(pk__in=found).delete()
+            refresh_days(user, {trading_day(entry_date) for entry_date in found.values()})
+        bump_version(user.pk)
+    return results
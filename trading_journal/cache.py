@@ -0,0 +1,114 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max
+from rest_framework import status
+from rest_framework.response import Response
+
+ANALYTICS_TIMEOUT = 60 * 60
+
+
+def _version_key(user_id):
+    return f'trading_journal:data_version:{user_id}'
+
+
+def data_version(user_id):
+    """Token that changes whenever any of the user's trades, tags, rules or journal entries change.
+
+    A fresh token is minted if the cache has lost the old one, so an evicted
+    version can never bring back entries computed from older data.
+    """
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        cache.add(_version_key(user_id), f'{time.time_ns():x}', None)
+        version = cache.get(_version_key(user_id))
+    return version
+
+
+def bump_version(user_id):
+    """Invalidate everything cached for the user once the current transaction commits.
+
+    Bumping earlier would let another process cache the old rows under the
+    new version before they are replaced. Returns the version the write
+    will publish.
+    """
+    version = f'{time.time_ns():x}'
+    transaction.on_commit(lambda: cache.set(_version_key(user_id), version, None))
+    return version
+
+
+def version_time(version):
+    """Unix time, in whole seconds, at which a data version was minted."""
+    return int(version, 16) // 10 ** 9
+
+
+def row_validators(request, queryset, count=False):
+    """ETag, Last-Modified (a Unix time) and row count for a GET that returns rows of queryset.
+
+    The validators come from the user's data version, which moves on every
+    write including deletes and changes to a tag, category or rule shown
+    inside a row, and the latest updated_at of the filtered rows. That
+    maximum is one lookup on the (user, updated_at) index rather than a scan
+    of the rows. The ETag covers the query string and media type as well,
+    since they decide which page and fields are sent.
+
+    The rows are only counted, in the same query, when count is true;
+    otherwise the count is None.
+    """
+    aggregates = {'latest': Max('updated_at')}
+    if count:
+        aggregates['rows'] = Count('pk')
+    summary = queryset.aggregate(**aggregates)
+    latest = summary['latest']
+    version = data_version(request.user.pk)
+    key = ':'.join([
+        'trading_journal:rows', str(request.user.pk), version, queryset.model._meta.label,
+        latest.isoformat() if latest else '',
+        request.accepted_media_type or '', repr(sorted(request.query_params.lists()))
+    ])
+    last_modified = version_time(version)
+    if latest:
+        last_modified = max(last_modified, int(latest.timestamp()))
+    return f'"{hashlib.md5(key.encode()).hexdigest()}"', last_modified, summary.get('rows')
+
+
+def _etags(header):
+    return {tag.strip().removeprefix('W/') for tag in header.split(',')}
+
+
+def cached_analytics(timeout=ANALYTICS_TIMEOUT):
+    """Cache a TradeViewSet action's response per user, data version and query string.
+
+    The response carries an ETag derived from the same key, and a request
+    whose If-None-Match still matches gets a 304 without the action running.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(self, request, *args, **kwargs):
+            params = sorted(request.query_params.lists())
+            key = ':'.join([
+                'trading_journal:analytics', str(request.user.pk),
+                data_version(request.user.pk), view.__name__,
+                hashlib.md5(repr(params).encode()).hexdigest()
+            ])
+            etag = f'"{hashlib.md5(key.encode()).hexdigest()}"'
+
+            if etag in _etags(request.headers.get('If-None-Match', '')):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                data = cache.get(key)
+                if data is None:
+                    response = view(self, request, *args, **kwargs)
+                    if response.status_code != status.HTTP_200_OK:
+                        return response
+                    cache.set(key, response.data, timeout)
+                else:
+                    response = Response(data)
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+# Backends whose entries live inside a single process
+PROCESS_LOCAL_CACHES = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    """Warn when the cache cannot carry the data version between processes."""
+    if settings.CACHES['default']['BACKEND'] in PROCESS_LOCAL_CACHES:
+        return [Warning(
+            'The default cache is local to each process, so cached analytics go stale '
+            'when another process writes trades.',
+            hint='Use a shared backend, such as the file, database, memcached or Redis cache.',
+            obj='CACHES',
+            id='trading_journal.W001',
+        )]
+    return []
@@ -0,0 +1,50 @@
+from django.db.models import Case, CharField, FloatField, Func, Q, Value, When
+from django.db.models.lookups import LessThan
+
+
+class HoldingSeconds(Func):
+    """Seconds from start to end, two datetime expressions, in each backend's own date arithmetic."""
+    output_field = FloatField()
+    arity = 2
+    template = 'EXTRACT(EPOCH FROM (%(expressions)s))'
+    arg_joiner = ' - '
+
+    def __init__(self, start, end, **extra):
+        # Stored end first so the default template reads "end - start"
+        super().__init__(end, start, **extra)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # julianday() counts days in a float, so round off its error to the millisecond
+        return self.as_sql(
+            compiler, connection,
+            template='ROUND((julianday(%(expressions)s)) * 86400.0, 3)', arg_joiner=') - julianday(',
+            **extra_context
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        clone = self.copy()
+        clone.set_source_expressions(self.get_source_expressions()[::-1])
+        return super(HoldingSeconds, clone).as_sql(
+            compiler, connection,
+            template='TIMESTAMPDIFF(SECOND, %(expressions)s)', arg_joiner=', ',
+            **extra_context
+        )
+
+
+HOLDING_BUCKETS = [
+    (5 * 60, 'Under 5 minutes'),
+    (60 * 60, '5 minutes to 1 hour'),
+    (24 * 60 * 60, '1 hour to 1 day'),
+    (7 * 24 * 60 * 60, '1 day to 1 week'),
+]
+
+
+def holding_bucket(start='entry_date', end='exit_date'):
+    """Label a trade with the range its holding time falls in."""
+    seconds = HoldingSeconds(start, end)
+    return Case(
+        When(Q(**{f'{end}__isnull': True}), then=Value('Unknown')),
+        *[When(LessThan(seconds, limit), then=Value(label)) for limit, label in HOLDING_BUCKETS],
+        default=Value('Over 1 week'),
+        output_field=CharField()
+    )
@@ -0,0 +1,276 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import bump_version, data_version
+from .matching import LotMatcher
+from .models import ImportedStatement, OpenLot, Trade
+from .parsers import ThinkOrSwimParser
+from .rolling import record_trades
+from .rollups import refresh_days, trading_day
+
+BATCH_SIZE = 500
+
+
+def _aware(value):
+    if value is not None and timezone.is_naive(value):
+        return timezone.make_aware(value)
+    return value
+
+
+def _money(value):
+    return Decimal(str(round(value, 2)))
+
+
+NATURAL_KEY = ('ticker_symbol', 'contract', 'entry_date', 'exit_date', 'trade_type')
+
+
+def natural_key(trade):
+    """Fields that identify an imported trade for duplicate detection."""
+    return tuple(getattr(trade, field) for field in NATURAL_KEY)
+
+
+def build_trade(user, trade_data):
+    """Turn a matched trade from the parser into an unsaved Trade."""
+    return Trade(
+        user=user,
+        entry_date=_aware(trade_data['entry_date']),
+        exit_date=_aware(trade_data['exit_date']),
+        trade_type=trade_data['trade_type'],
+        ticker_symbol=trade_data['ticker_symbol'],
+        contract=trade_data.get('contract', ''),
+        entry_price=_money(trade_data['entry_price']),
+        exit_price=_money(trade_data['exit_price']),
+        position_size=_money(trade_data['position_size']),
+        fees=_money(trade_data.get('fees', 0)),
+        profit_loss=_money(trade_data['profit_loss']),
+        is_win=trade_data['is_win'],
+        notes=trade_data.get('notes', ''),
+    )
+
+
+def existing_keys(user, trades):
+    """Natural keys of the user's stored trades over the entry dates of trades, in one query."""
+    entry_dates = [trade.entry_date for trade in trades]
+    return set(
+        Trade.objects.filter(
+            user=user,
+            entry_date__gte=min(entry_dates),
+            entry_date__lte=max(entry_dates)
+        ).order_by().values_list(*NATURAL_KEY)
+    )
+
+
+def _leg(execution):
+    """The natural key fields a trade takes from one of its executions, with its time."""
+    return (
+        execution['symbol'],
+        LotMatcher._notes(execution),
+        _aware(execution['exec_time']),
+        'STOCK' if execution['type'] == 'STOCK' else 'OPTION',
+    )
+
+
+def save_trades(user, trades_data, batch_size=BATCH_SIZE):
+    """Insert the trades that the user does not already have.
+
+    Existing natural keys for the covered date range are loaded with a single
+    query, and the new trades are written with bulk_create in one transaction
+    together with the daily P&L rows of the days they fall on. The unique
+    constraint on the natural key guards against concurrent imports.
+    """
+    trades = [build_trade(user, trade_data) for trade_data in trades_data]
+    if not trades:
+        return {'trades_created': 0, 'duplicates_skipped': 0}
+
+    existing = existing_keys(user, trades)
+
+    new_trades = []
+    for trade in trades:
+        key = natural_key(trade)
+        if key not in existing:
+            existing.add(key)
+            new_trades.append(trade)
+
+    if new_trades:
+        previous_version = data_version(user.pk)
+        with transaction.atomic():
+            Trade.objects.bulk_create(new_trades, batch_size=batch_size, ignore_conflicts=True)
+            # bulk_create sends no signals, so bring the touched days up to date here
+            refresh_days(user, {trading_day(trade.entry_date) for trade in new_trades})
+        version = bump_version(user.pk)
+        record_trades(user.pk, new_trades, previous_version, version)
+
+    return {
+        'trades_created': len(new_trades),
+        'duplicates_skipped': len(trades) - len(new_trades),
+    }
+
+
+def _lot_to_execution(lot):
+    return {
+        'exec_time': timezone.make_naive(lot.opened_at),
+        'side': lot.side,
+        'qty': float(lot.quantity),
+        'pos_effect': 'TO OPEN',
+        'symbol': lot.ticker_symbol,
+        'exp': lot.expiration or None,
+        'strike': lot.strike or None,
+        'type': lot.instrument_type,
+        'price': float(lot.price),
+        'fees': float(lot.fees),
+    }
+
+
+def _execution_to_lot(user, execution):
+    return OpenLot(
+        user=user,
+        position_key=execution['position_key'],
+        ticker_symbol=execution['symbol'],
+        instrument_type=execution['type'],
+        expiration=execution['exp'] or '',
+        strike=execution['strike'] or '',
+        side=execution['side'],
+        opened_at=_aware(execution['exec_time']),
+        price=Decimal(str(round(execution['price'], 4))),
+        quantity=Decimal(str(round(execution['qty'], 4))),
+        fees=Decimal(str(round(execution.get('fees', 0.0), 4))),
+    )
+
+
+def match_executions(user, executions, method='fifo'):
+    """Match new executions against the user's stored open lots and save the result.
+
+    Only lots for positions that appear in the new executions are loaded, so
+    the work depends on the size of the import rather than on the account's
+    history. Trades are saved, consumed lots are removed and whatever is left
+    open, including the remainder of partially closed lots, is stored for the
+    next import.
+
+    Matching is idempotent: a close whose trade against a stored lot already
+    exists was applied by an earlier run, so it is left out rather than
+    consuming the lot a second time.
+    """
+    executions = list(executions)
+    keys = {LotMatcher.position_key(execution) for execution in executions}
+    with transaction.atomic():
+        stored = list(
+            OpenLot.objects.select_for_update().filter(user=user, position_key__in=keys)
+        ) if keys else []
+        # A lot whose opening execution is being imported again is rebuilt
+        # from that execution rather than carried over twice
+        reopened = {
+            (LotMatcher.position_key(e), e['side'], _aware(e['exec_time']))
+            for e in executions if e['pos_effect'] == 'TO OPEN'
+        }
+        carried = [
+            _lot_to_execution(lot) for lot in stored
+            if (lot.position_key, lot.side, lot.opened_at) not in reopened
+        ]
+        result = LotMatcher(method).match(carried + executions)
+
+        trades = [build_trade(user, trade) for trade in result['trades']]
+        if carried and trades:
+            existing = existing_keys(user, trades)
+            opened_here = {_leg(e) for e in executions if e['pos_effect'] == 'TO OPEN'}
+            applied = {
+                (trade.ticker_symbol, trade.contract, trade.exit_date, trade.trade_type)
+                for trade in trades
+                if natural_key(trade) in existing
+                and (trade.ticker_symbol, trade.contract, trade.entry_date, trade.trade_type) not in opened_here
+            }
+            if applied:
+                executions = [
+                    e for e in executions if e['pos_effect'] != 'TO CLOSE' or _leg(e) not in applied
+                ]
+                result = LotMatcher(method).match(carried + executions)
+
+        saved = save_trades(user, result['trades'])
+        OpenLot.objects.filter(pk__in=[lot.pk for lot in stored]).delete()
+        OpenLot.objects.bulk_create(
+            [_execution_to_lot(user, lot) for lot in result['open_lots']], batch_size=BATCH_SIZE
+        )
+
+    saved['open_lots'] = len(result['open_lots'])
+    saved['trades_matched'] = len(result['trades'])
+    return saved
+
+
+def import_statement(user, source, progress=None, method='fifo'):
+    """Parse a ThinkOrSwim statement and save its trades for the user.
+
+    Statements are recorded in the user's ImportedStatement ledger. A file
+    that was already imported is skipped without being parsed, and
+    executions an earlier statement for the same account already held, up
+    to its latest execution, are left out. The remaining executions are matched
+    against the user's stored open lots. progress, if given, is called with
+    the number of executions parsed so far.
+    """
+    parser = ThinkOrSwimParser(source)
+    result = {
+        'rows_parsed': 0,
+        'trades_created': 0,
+        'duplicates_skipped': 0,
+        'executions_skipped': 0,
+        'duplicate_statement': False,
+        'errors': parser.errors,
+    }
+
+    content_hash = parser.fingerprint()
+    ledger = list(
+        ImportedStatement.objects.filter(user=user)
+        .values_list('content_hash', 'account', 'period_start', 'period_end', 'last_execution')
+    )
+    latest = None
+    if any(entry[0] == content_hash for entry in ledger):
+        result['duplicate_statement'] = True
+        return result
+
+    def include(execution):
+        nonlocal latest
+        exec_time = _aware(execution['exec_time'])
+        if latest is None or exec_time > latest:
+            latest = exec_time
+        # The header precedes the trade history, so it is known by now
+        info = parser.statement_info
+        if info is None:
+            return True
+        day = exec_time.date()
+        for _, account, start, end, last_execution in ledger:
+            if account != info['account'] or not (start and end and start <= day <= end):
+                continue
+            # A statement exported mid-day only covers its day up to its last execution
+            if last_execution is None or exec_time <= last_execution:
+                result['executions_skipped'] += 1
+                return False
+        return True
+
+    executions = parser.load_executions(progress=progress, include=include)
+    result['rows_parsed'] = parser.rows_parsed
+    # The ledger row commits with the trades and lots, so a run that dies
+    # after matching leaves neither behind
+    with transaction.atomic():
+        if executions:
+            saved = match_executions(user, executions, method=method)
+            result['trades_created'] = saved['trades_created']
+            result['duplicates_skipped'] = saved['duplicates_skipped']
+            if not saved['trades_matched'] and not saved['open_lots']:
+                result['errors'].append('No trades found in CSV file')
+        elif not result['executions_skipped']:
+            result['errors'].append('No trades found in CSV file')
+
+        if parser.rows_parsed:
+            info = parser.statement_info or {}
+            ImportedStatement.objects.get_or_create(
+                user=user,
+                content_hash=content_hash,
+                defaults={
+                    'account': info.get('account', ''),
+                    'period_start': info.get('period_start'),
+                    'period_end': info.get('period_end'),
+                    'last_execution': latest,
+                    'rows_parsed': parser.rows_parsed,
+                }
+            )
+    return result
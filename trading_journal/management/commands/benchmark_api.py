@@ -0,0 +1,79 @@
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+from trading_journal.benchmarks import measure, report
+from trading_journal.importers import save_trades
+from trading_journal.matching import LotMatcher
+from trading_journal.models import Tag, Trade
+from trading_journal.synthetic import StatementGenerator
+
+class Command(BaseCommand):
+    help = 'Benchmark the trade list endpoint with the full serializer against ?fields= rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trades', type=int, default=5000, help='Trades to create for the benchmark user')
+        parser.add_argument('--page-size', type=int, nargs='+', default=[50, 500])
+        parser.add_argument('--fields', type=str,
+                            default='trade_id,ticker_symbol,trade_type,entry_date,exit_date,profit_loss,tags')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per benchmark; the best is kept')
+        parser.add_argument('--output', type=str, help='Write the results as JSON to this file')
+        parser.add_argument('--compare', type=str, help='Earlier JSON results to compare against')
+
+    def create_trades(self, user, count, seed):
+        """Fill the user's journal with trades matched from a synthetic statement, tagged round-robin."""
+        executions = []
+        for when, position, side, qty, effect, price in StatementGenerator(count * 3, seed=seed).executions():
+            executions.append({
+                'exec_time': when, 'side': side, 'qty': qty, 'pos_effect': effect,
+                'symbol': position['symbol'], 'exp': position['exp'] or None,
+                'strike': position['strike'] or None, 'type': position['type'], 'price': price,
+            })
+        save_trades(user, LotMatcher().match(executions)['trades'][:count])
+
+        tags = [Tag.objects.create(name=f'benchmark-{user.pk}-{i}', created_by=user) for i in range(5)]
+        through = Trade.tags.through
+        through.objects.bulk_create([
+            through(trade_id=trade_id, tag_id=tags[i % len(tags)].pk)
+            for i, trade_id in enumerate(Trade.objects.filter(user=user).values_list('pk', flat=True))
+        ])
+
+    def bench_list(self, client, params, repeat):
+        sizes = []
+
+        def run():
+            response = client.get('/api/trades/', params)
+            sizes.append(len(response.content))
+            return len(response.data['results'])
+
+        result = measure(run, repeat)
+        result['bytes'] = sizes[-1]
+        return result
+
+    def handle(self, *args, **options):
+        results = []
+        with transaction.atomic(), override_settings(ALLOWED_HOSTS=['testserver']):
+            user = User.objects.create_user(f'benchmark-{time.monotonic_ns()}')
+            self.create_trades(user, options['trades'], options['seed'])
+            client = APIClient()
+            client.force_authenticate(user)
+
+            for page_size in options['page_size']:
+                for name, params in [
+                    ('serializer', {'page_size': page_size}),
+                    ('fields', {'page_size': page_size, 'fields': options['fields'], 'expand': 'tags'}),
+                ]:
+                    # Analytics caching does not apply to lists, so every run does the full work
+                    result = {'benchmark': name, 'size': page_size}
+                    result.update(self.bench_list(client, params, options['repeat']))
+                    results.append(result)
+                    self.stdout.write(
+                        f"{name:<10} page {page_size:>6}  {result['seconds'] * 1000:>9.1f} ms  "
+                        f"{result['bytes'] / 1024:>9.1f} KB  {result['peak_mb']:>8.1f} MB peak"
+                    )
+            transaction.set_rollback(True)
+
+        report(self, results, options['output'], options['compare'])
@@ -0,0 +1,75 @@
+import io
+import tempfile
+import time
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+from trading_journal.benchmarks import measure, report
+from trading_journal.models import ImportJob
+from trading_journal.parsers import ThinkOrSwimParser
+from trading_journal.synthetic import StatementGenerator
+from trading_journal.worker import ImportWorker
+
+class Command(BaseCommand):
+    help = 'Benchmark statement parsing and the import_csv path on synthetic statements'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                            help='Number of executions per generated statement')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--repeat', type=int, default=3, help='Timed runs per benchmark; the best is kept')
+        parser.add_argument('--skip-import', action='store_true', help='Only benchmark the parser')
+        parser.add_argument('--output', type=str, help='Write the results as JSON to this file')
+        parser.add_argument('--compare', type=str, help='Earlier JSON results to compare against')
+
+    def bench_parse(self, data, repeat):
+        def run():
+            parser = ThinkOrSwimParser(io.BytesIO(data))
+            parser.parse()
+            return parser.rows_parsed
+        return measure(run, repeat)
+
+    def bench_import(self, data, repeat):
+        """Time upload, queueing and the worker run, rolling the database back after each run."""
+        client = APIClient()
+
+        def run():
+            with transaction.atomic():
+                user = User.objects.create_user(f'benchmark-{time.monotonic_ns()}')
+                client.force_authenticate(user)
+                upload = SimpleUploadedFile('statement.csv', data, content_type='text/csv')
+                response = client.post('/api/trades/import_csv/', {'file': upload}, format='multipart')
+                # Run this job, not whichever real upload happens to be oldest in the queue
+                worker = ImportWorker()
+                job = worker.run_job(worker.claim(ImportJob.objects.get(pk=response.data['job_id'])))
+                transaction.set_rollback(True)
+            return job.rows_parsed
+
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root, ALLOWED_HOSTS=['testserver']):
+            return measure(run, repeat)
+
+    def handle(self, *args, **options):
+        results = []
+        for size in options['sizes']:
+            stream = io.StringIO()
+            StatementGenerator(size, seed=options['seed']).write(stream)
+            data = stream.getvalue().encode('utf-8')
+            del stream
+
+            benchmarks = [('parse', self.bench_parse)]
+            if not options['skip_import']:
+                benchmarks.append(('import_csv', self.bench_import))
+            for name, bench in benchmarks:
+                result = {'benchmark': name, 'size': size, 'bytes': len(data)}
+                result.update(bench(data, options['repeat']))
+                results.append(result)
+                self.stdout.write(
+                    f"{name:<10} {size:>9} executions  {result['seconds']:>9.3f}s  "
+                    f"{result['peak_mb']:>8.1f} MB peak  {result['rows_per_sec'] or 0:>10,} rows/sec"
+                )
+
+        report(self, results, options['output'], options['compare'])
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from trading_journal.synthetic import StatementGenerator
+
+class Command(BaseCommand):
+    help = 'Write a synthetic ThinkOrSwim statement for testing and benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', type=str, help='Path of the CSV file to write')
+        parser.add_argument('--executions', type=int, default=1000, help='Number of executions to generate')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+            StatementGenerator(options['executions'], seed=options['seed']).write(output)
+        self.stdout.write(
+            self.style.SUCCESS(f"Wrote {options['executions']} executions to {options['output']}")
+        )
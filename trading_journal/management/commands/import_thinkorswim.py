@@ -1,125 +1,120 @@
-import csv
-from datetime import datetime
-from django.core.management.base import BaseCommand
+import glob
+import heapq
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
-from trading_journal.models import Trade
+from django.utils import timezone
+from trading_journal.importers import match_executions
+from trading_journal.matching import LotMatcher
+from trading_journal.models import ImportedStatement
+from trading_journal.parsers import read_statement
+
+def execution_key(execution):
+    return tuple(execution[field] for field in (
+        'exec_time', 'symbol', 'exp', 'strike', 'type', 'side', 'pos_effect', 'qty', 'price'
+    ))
 
 class Command(BaseCommand):
-    help = 'Import trades from ThinkOrSwim CSV file'
+    help = 'Import trades from ThinkOrSwim CSV statements (files, directories or glob patterns)'
 
     def add_arguments(self, parser):
-        parser.add_argument('csv_file', type=str, help='Path to the CSV file')
+        parser.add_argument('paths', nargs='+', type=str,
+                            help='CSV files, directories of CSV files or glob patterns')
+        parser.add_argument('--user', required=True, help='Username to import the trades for')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Number of processes used to parse statements')
+        parser.add_argument('--method', choices=LotMatcher.METHODS, default='fifo',
+                            help='Lot matching method')
 
-    def handle(self, *args, **options):
-        csv_file = options['csv_file']
-        trades_section = False
-        trades_data = []
+    def collect_files(self, paths):
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                files.extend(glob.glob(os.path.join(path, '*.csv')))
+            elif os.path.isfile(path):
+                files.append(path)
+            else:
+                files.extend(glob.glob(path, recursive=True))
+        return sorted(set(files))
 
-        # Read the CSV file
-        with open(csv_file, 'r') as file:
-            csv_reader = csv.reader(file)
-            
-            for row in csv_reader:
-                if not row:  # Skip empty rows
-                    continue
-                    
-                # Detect start of Account Trade History section
-                if row[0].strip() == 'Account Trade History':
-                    trades_section = True
-                    continue
-                    
-                if trades_section:
-                    # Skip the header row
-                    if row[0].strip() == 'Exec Time':
-                        continue
-                    
-                    # If we hit a blank line or new section, stop processing
-                    if not row[0].strip() or row[0].strip() == 'Profits and Losses':
-                        break
-                        
-                    trades_data.append(row)
+    def merge_executions(self, statements):
+        """Merge per-file executions in time order.
 
-        # Process trades
-        with transaction.atomic():
-            for row in trades_data:
-                if len(row) < 11:  # Skip invalid rows
-                    continue
+        Overlapping statements repeat the same executions, so each distinct
+        execution is kept as many times as the most any single file has it.
+        """
+        allowed = Counter()
+        for executions in statements:
+            for key, count in Counter(map(execution_key, executions)).items():
+                allowed[key] = max(allowed[key], count)
 
-                exec_time_str = row[0].strip()
-                spread = row[1].strip()
-                side = row[2].strip()
-                qty = row[3].strip()
-                pos_effect = row[4].strip()
-                symbol = row[5].strip()
-                exp = row[6].strip()
-                strike = row[7].strip()
-                type_ = row[8].strip()
-                price = float(row[9].strip())
-                net_price = float(row[10].strip())
+        merged = []
+        seen = Counter()
+        for execution in heapq.merge(*statements, key=lambda e: e['exec_time']):
+            key = execution_key(execution)
+            if seen[key] < allowed[key]:
+                seen[key] += 1
+                merged.append(execution)
+        return merged
 
-                # Parse datetime
-                exec_time = datetime.strptime(exec_time_str, '%m/%d/%y %H:%M:%S')
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'User "{options["user"]}" does not exist')
+
+        files = self.collect_files(options['paths'])
+        if not files:
+            raise CommandError('No statement files found')
 
-                # Determine if it's an opening or closing trade
-                is_opening = pos_effect == 'TO OPEN'
-                
-                # Calculate position size (quantity * price * 100 for options)
-                quantity = abs(float(qty))
-                position_size = quantity * price
-                if type_ == 'PUT' or type_ == 'CALL':
-                    position_size *= 100  # Options contracts are for 100 shares
+        started = time.perf_counter()
 
-                # Create trade object
-                trade = Trade(
-                    trade_type='OPTION' if type_ in ['PUT', 'CALL'] else 'STOCK',
-                    ticker_symbol=symbol,
-                    entry_date=exec_time if is_opening else None,
-                    exit_date=exec_time if not is_opening else None,
-                    entry_price=price if is_opening else None,
-                    exit_price=price if not is_opening else None,
-                    position_size=position_size,
-                    notes=f"{type_} {strike} {exp}" if type_ in ['PUT', 'CALL'] else "",
-                    fees=0,  # You might want to add fees from the Cash Balance section
-                )
+        # Parse the statements in parallel
+        workers = max(1, min(options['workers'] or 1, len(files)))
+        if workers == 1:
+            parsed_files = [read_statement(path) for path in files]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                parsed_files = list(pool.map(read_statement, files))
+        rows = sum(len(executions) for executions, _ in parsed_files)
+        parsed = time.perf_counter()
 
-                # Try to find matching trade to complete the entry/exit
-                if not is_opening:
-                    # Look for the opening trade
-                    try:
-                        opening_trade = Trade.objects.filter(
-                            ticker_symbol=symbol,
-                            exit_date__isnull=True,
-                            trade_type=trade.trade_type,
-                            notes=trade.notes
-                        ).latest('entry_date')
-                        
-                        # Calculate P&L
-                        profit_loss = (price - opening_trade.entry_price) * quantity
-                        if trade.trade_type == 'OPTION':
-                            profit_loss *= 100
-                            
-                        # Update the opening trade
-                        opening_trade.exit_date = exec_time
-                        opening_trade.exit_price = price
-                        opening_trade.profit_loss = profit_loss
-                        opening_trade.is_win = profit_loss > 0
-                        opening_trade.save()
-                        
-                        self.stdout.write(
-                            self.style.SUCCESS(
-                                f'Updated trade for {symbol}: {"profit" if profit_loss > 0 else "loss"} of ${profit_loss:.2f}'
-                            )
-                        )
-                        continue
-                        
-                    except Trade.DoesNotExist:
-                        pass
+        # Statements already in the ledger were imported before, by this
+        # command or by an upload; files repeated in this run count once
+        imported = set(
+            ImportedStatement.objects.filter(user=user).values_list('content_hash', flat=True)
+        )
+        statements, ledger = [], {}
+        for executions, entry in parsed_files:
+            if entry['content_hash'] in imported or entry['content_hash'] in ledger:
+                continue
+            statements.append(executions)
+            if entry['last_execution'] is not None:
+                entry['last_execution'] = timezone.make_aware(entry['last_execution'])
+            if entry['rows_parsed']:
+                ledger[entry['content_hash']] = ImportedStatement(user=user, **entry)
 
-                trade.save()
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f'Created {"opening" if is_opening else "closing"} trade for {symbol}'
-                    )
-                )
+        executions = self.merge_executions(statements)
+        with transaction.atomic():
+            result = match_executions(user, executions, method=options['method'])
+            ImportedStatement.objects.bulk_create(ledger.values(), ignore_conflicts=True)
+        finished = time.perf_counter()
 
-        self.stdout.write(self.style.SUCCESS('Successfully imported trades')) 
\ No newline at end of file
+        elapsed = max(finished - started, 1e-9)
+        self.stdout.write(
+            f'Parsed {rows} executions from {len(files)} files with {workers} workers '
+            f'in {parsed - started:.2f}s; matched and saved in {finished - parsed:.2f}s'
+        )
+        self.stdout.write(
+            f'Throughput: {rows / elapsed:,.0f} rows/sec, {result["trades_matched"] / elapsed:,.0f} trades/sec'
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Successfully imported {result["trades_created"]} trades '
+                f'({result["duplicates_skipped"]} duplicates skipped, {result["open_lots"]} lots left open)'
+            )
+        )
@@ -0,0 +1,19 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from trading_journal.rollups import rebuild
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily P&L rollup from the trades table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=str, help='Only rebuild the rollup for this username')
+
+    def handle(self, *args, **options):
+        users = None
+        if options['user']:
+            users = User.objects.filter(username=options['user'])
+            if not users.exists():
+                raise CommandError(f'User "{options["user"]}" does not exist')
+
+        rows = rebuild(users)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt daily P&L rollup: {rows} days'))
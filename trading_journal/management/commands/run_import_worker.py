@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from trading_journal.worker import ImportWorker
+
+class Command(BaseCommand):
+    help = 'Run the background worker that processes queued statement imports'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process pending jobs and exit')
+        parser.add_argument('--poll-interval', type=float, default=None,
+                            help='Seconds to wait between polls when the queue is empty')
+
+    def handle(self, *args, **options):
+        worker = ImportWorker(poll_interval=options['poll_interval'])
+
+        if not options['once']:
+            self.stdout.write(f'Import worker {worker.name} started')
+            worker.run_forever()
+
+        while True:
+            job = worker.run_once()
+            if job is None:
+                break
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Job {job.pk} {job.status.lower()}: {job.trades_created} trades created, '
+                    f'{job.duplicates_skipped} duplicates skipped'
+                )
+            )
@@ -0,0 +1,253 @@
+import numpy as np
+
+
+class LotMatcher:
+    """Match opening and closing executions into round-trip trades.
+
+    Executions are turned into column arrays and grouped by position key
+    (symbol, plus expiration, strike and put/call for options). FIFO matching
+    is done for all positions at once by intersecting the cumulative quantity
+    ranges of the opens with those of the closes, so each close can consume
+    several lots and each lot can be split across several closes. LIFO uses a
+    stack per position. A close is never matched against a lot opened after it;
+    any quantity closed beyond the open lots is left unmatched. Fees of each
+    execution are shared out by quantity and deducted from the trade's P&L.
+    Segments of the same position opened and closed at the same times, such
+    as a lot closed by two fills in one second, become a single trade with
+    quantity-weighted prices, so every trade has its own natural key.
+    """
+    METHODS = ('fifo', 'lifo')
+    # Quantities below this are treated as fully consumed
+    EPSILON = 1e-9
+
+    def __init__(self, method='fifo'):
+        if method not in self.METHODS:
+            raise ValueError(f"Unknown matching method: {method}")
+        self.method = method
+
+    @staticmethod
+    def position_key(execution):
+        """Identify the position an execution belongs to."""
+        if execution['type'] == 'STOCK':
+            return execution['symbol']
+        return f"{execution['symbol']}|{execution['exp']}|{execution['strike']}|{execution['type']}"
+
+    def _columns(self, executions):
+        """Convert executions into column arrays sorted by execution time.
+
+        Executions sharing a timestamp keep the order they were given in.
+        """
+        executions = list(executions)
+        times = np.array([e['exec_time'] for e in executions], dtype='datetime64[us]')
+        order = np.argsort(times, kind='stable')
+        executions = [executions[i] for i in order]
+
+        keys = [self.position_key(e) for e in executions]
+        key_codes = np.unique(np.array(keys, dtype=object), return_inverse=True)[1] if keys else np.array([])
+        return {
+            'executions': executions,
+            'time': times[order],
+            'key': key_codes.astype(np.int64),
+            'is_open': np.array([e['pos_effect'] == 'TO OPEN' for e in executions], dtype=bool),
+            'is_close': np.array([e['pos_effect'] == 'TO CLOSE' for e in executions], dtype=bool),
+            'qty': np.array([e['qty'] for e in executions], dtype=np.float64),
+            'price': np.array([e['price'] for e in executions], dtype=np.float64),
+            'fees': np.array([e.get('fees', 0.0) for e in executions], dtype=np.float64),
+        }
+
+    def match(self, executions):
+        """Return the matched trades and the lots still open afterwards."""
+        cols = self._columns(executions)
+        if not cols['executions']:
+            return {'trades': [], 'open_lots': []}
+        if self.method == 'fifo':
+            segments, remaining = self._match_fifo(cols)
+        else:
+            segments, remaining = self._match_lifo(cols)
+        return {
+            'trades': self._build_trades(cols, *segments),
+            'open_lots': self._build_open_lots(cols, *remaining),
+        }
+
+    def _match_fifo(self, cols):
+        n = len(cols['executions'])
+        seq = np.arange(n, dtype=np.int64)
+        # Composite sort key: position first, then execution order
+        rank = cols['key'] * (n + 1) + seq
+
+        opens = np.flatnonzero(cols['is_open'] & (cols['qty'] > 0))
+        closes = np.flatnonzero(cols['is_close'] & (cols['qty'] > 0))
+        opens = opens[np.argsort(rank[opens], kind='stable')]
+        closes = closes[np.argsort(rank[closes], kind='stable')]
+        if not len(closes):
+            empty = np.array([], dtype=np.int64)
+            return (empty, empty, np.array([])), (opens, cols['qty'][opens])
+        open_rank = rank[opens]
+        close_key = cols['key'][closes]
+
+        # Opens laid end to end: lot i covers [open_start[i], open_end[i])
+        open_end = np.cumsum(cols['qty'][opens])
+        open_start = open_end - cols['qty'][opens]
+        open_cum = np.concatenate(([0.0], open_end))
+
+        # Quantity opened in the same position before each close
+        group_start = np.searchsorted(open_rank, close_key * (n + 1), side='left')
+        opened_before = np.searchsorted(open_rank, rank[closes], side='left')
+        base = open_cum[group_start]
+        available = open_cum[opened_before] - base
+
+        # Cumulative close quantity within each position
+        close_qty = cols['qty'][closes]
+        close_cum = np.cumsum(close_qty)
+        first_in_group = np.ones(len(closes), dtype=bool)
+        first_in_group[1:] = close_key[1:] != close_key[:-1]
+        close_cum -= np.maximum.accumulate(np.where(first_in_group, close_cum - close_qty, 0.0))
+
+        # Quantity closed beyond what was open is unmatched; the shortfall only
+        # grows within a position, so it is a running maximum reset per position
+        shortfall = np.maximum(close_cum - available, 0.0)
+        group_id = np.cumsum(first_in_group) - 1
+        step = shortfall.max() + 1.0
+        shortfall = np.maximum.accumulate(shortfall + group_id * step) - group_id * step
+        matched_end = close_cum - shortfall
+        matched_start = np.empty_like(matched_end)
+        matched_start[1:] = matched_end[:-1]
+        matched_start[first_in_group] = 0.0
+        matched_start += base
+        matched_end += base
+
+        # Each close consumes the lots overlapping its matched range
+        has_match = matched_end - matched_start > self.EPSILON
+        closes, matched_start, matched_end = closes[has_match], matched_start[has_match], matched_end[has_match]
+        first_lot = np.searchsorted(open_end, matched_start + self.EPSILON, side='left')
+        last_lot = np.searchsorted(open_start, matched_end - self.EPSILON, side='left') - 1
+        counts = np.maximum(last_lot - first_lot + 1, 0)
+
+        close_pos = np.repeat(np.arange(len(closes)), counts)
+        lot_pos = np.repeat(first_lot, counts) + (
+            np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        )
+        qty = (np.minimum(open_end[lot_pos], matched_end[close_pos])
+               - np.maximum(open_start[lot_pos], matched_start[close_pos]))
+        keep = qty > self.EPSILON
+        segments = (opens[lot_pos][keep], closes[close_pos][keep], qty[keep])
+
+        # Whatever is left of each lot after the last matched close stays open
+        lot_key = cols['key'][opens]
+        matched_key = close_key[has_match]
+        last_close = np.searchsorted(matched_key, lot_key, side='right') - 1
+        consumed_to = np.full(len(opens), -np.inf)
+        if len(matched_key):
+            last_close = np.maximum(last_close, 0)
+            same_position = matched_key[last_close] == lot_key
+            consumed_to[same_position] = matched_end[last_close][same_position]
+        consumed = np.clip(consumed_to - open_start, 0.0, cols['qty'][opens])
+        remaining_qty = cols['qty'][opens] - consumed
+        still_open = remaining_qty > self.EPSILON
+        return segments, (opens[still_open], remaining_qty[still_open])
+
+    def _match_lifo(self, cols):
+        stacks = {}
+        open_idx, close_idx, quantities = [], [], []
+        keys = cols['key'].tolist()
+        qtys = cols['qty'].tolist()
+        remaining = list(qtys)
+        for i, (key, is_open, is_close) in enumerate(zip(keys, cols['is_open'].tolist(), cols['is_close'].tolist())):
+            if is_open and qtys[i] > 0:
+                stacks.setdefault(key, []).append(i)
+            elif is_close:
+                stack = stacks.get(key)
+                to_close = qtys[i]
+                while stack and to_close > self.EPSILON:
+                    lot = stack[-1]
+                    used = min(remaining[lot], to_close)
+                    open_idx.append(lot)
+                    close_idx.append(i)
+                    quantities.append(used)
+                    remaining[lot] -= used
+                    to_close -= used
+                    if remaining[lot] <= self.EPSILON:
+                        stack.pop()
+
+        order = np.lexsort((np.array(open_idx, dtype=np.int64), np.array(close_idx, dtype=np.int64)))
+        segments = (
+            np.array(open_idx, dtype=np.int64)[order],
+            np.array(close_idx, dtype=np.int64)[order],
+            np.array(quantities, dtype=np.float64)[order],
+        )
+        lots = sorted(lot for stack in stacks.values() for lot in stack)
+        return segments, (np.array(lots, dtype=np.int64), np.array([remaining[i] for i in lots], dtype=np.float64))
+
+    @staticmethod
+    def _multiplier(execution):
+        return 1 if execution['type'] == 'STOCK' else 100
+
+    @staticmethod
+    def _notes(execution):
+        if execution['type'] == 'STOCK':
+            return ''
+        return f"{execution['type']} {execution['strike']} {execution['exp']}"
+
+    def _build_trades(self, cols, open_idx, close_idx, qty):
+        # Trades come out in the order the positions were closed
+        order = np.lexsort((open_idx, close_idx))
+        open_idx, close_idx, qty = open_idx[order], close_idx[order], qty[order]
+
+        price = cols['price']
+        multiplier = np.array([self._multiplier(e) for e in cols['executions']], dtype=np.float64)
+        long_position = np.array([e['side'] == 'BUY' for e in cols['executions']], dtype=bool)
+        direction = np.where(long_position[open_idx], 1.0, -1.0)
+        # Each side's fees are shared out by the fraction of its quantity matched
+        fees = (cols['fees'][open_idx] * qty / cols['qty'][open_idx]
+                + cols['fees'][close_idx] * qty / cols['qty'][close_idx])
+        profit_loss = (price[close_idx] - price[open_idx]) * direction * qty * multiplier[open_idx] - fees
+        position_size = qty * price[open_idx] * multiplier[open_idx]
+
+        executions = cols['executions']
+        keys = cols['key'].tolist()
+        trades = {}
+        quantities = {}
+        for o, c, q, size, fee, pnl in zip(open_idx.tolist(), close_idx.tolist(), qty.tolist(),
+                                           position_size.tolist(), fees.tolist(), profit_loss.tolist()):
+            opened, closed = executions[o], executions[c]
+            key = (keys[o], opened['exec_time'], closed['exec_time'], opened['side'])
+            trade = trades.get(key)
+            if trade is None:
+                quantities[key] = q
+                trades[key] = {
+                    'entry_date': opened['exec_time'],
+                    'exit_date': closed['exec_time'],
+                    'ticker_symbol': opened['symbol'],
+                    'contract': self._notes(opened),
+                    'trade_type': 'STOCK' if opened['type'] == 'STOCK' else 'OPTION',
+                    'entry_price': opened['price'],
+                    'exit_price': closed['price'],
+                    'position_size': size,
+                    'fees': fee,
+                    'profit_loss': pnl,
+                    'is_win': pnl > 0,
+                    'notes': self._notes(opened),
+                }
+                continue
+            # Another segment with the same natural key: fold it into the trade
+            total = quantities[key] + q
+            trade['entry_price'] = (trade['entry_price'] * quantities[key] + opened['price'] * q) / total
+            trade['exit_price'] = (trade['exit_price'] * quantities[key] + closed['price'] * q) / total
+            trade['position_size'] += size
+            trade['fees'] += fee
+            trade['profit_loss'] += pnl
+            trade['is_win'] = trade['profit_loss'] > 0
+            quantities[key] = total
+        return list(trades.values())
+
+    def _build_open_lots(self, cols, lot_idx, remaining):
+        executions = cols['executions']
+        return [
+            dict(
+                executions[i],
+                qty=qty,
+                fees=executions[i].get('fees', 0.0) * qty / executions[i]['qty'],
+                position_key=self.position_key(executions[i])
+            )
+            for i, qty in zip(lot_idx.tolist(), remaining.tolist())
+        ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.16 on 2026-10-17 04:09
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+NATURAL_KEY = ('user_id', 'ticker_symbol', 'entry_date', 'exit_date', 'trade_type')
+
+
+def remove_duplicate_trades(apps, schema_editor):
+    # Keep the first trade of each natural key, with the tags and rules of
+    # its duplicates; open trades (no exit date) never collide
+    Trade = apps.get_model('trading_journal', 'Trade')
+    groups = (
+        Trade.objects.filter(exit_date__isnull=False)
+        .values(*NATURAL_KEY)
+        .annotate(trades=Count('pk'), kept=Min('pk'))
+        .filter(trades__gt=1)
+        .order_by()
+    )
+    for group in groups:
+        kept = group.pop('kept')
+        del group['trades']
+        duplicates = list(Trade.objects.filter(**group).exclude(pk=kept).values_list('pk', flat=True))
+        for relation in ('tags', 'rules_followed'):
+            field = Trade._meta.get_field(relation)
+            through = field.remote_field.through
+            source, target = field.m2m_column_name(), field.m2m_reverse_name()
+            targets = through.objects.filter(**{f'{source}__in': duplicates}).values_list(target, flat=True)
+            through.objects.bulk_create(
+                [through(**{source: kept, target: pk}) for pk in set(targets)], ignore_conflicts=True
+            )
+        Trade.objects.filter(pk__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading_journal', '0005_remove_trade_quantity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='trade',
+            index=models.Index(fields=['user', 'entry_date'], name='trading_jou_user_id_0eab5c_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_trades, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='trade',
+            constraint=models.UniqueConstraint(fields=('user', 'ticker_symbol', 'entry_date', 'exit_date', 'trade_type'), name='unique_trade_natural_key'),
+        ),
+    ]
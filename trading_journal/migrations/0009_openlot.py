@@ -0,0 +1,38 @@
+# Generated by Django 4.2.16 on 2026-10-17 04:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('trading_journal', '0008_importedstatement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OpenLot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position_key', models.CharField(max_length=100)),
+                ('ticker_symbol', models.CharField(max_length=20)),
+                ('instrument_type', models.CharField(max_length=10)),
+                ('expiration', models.CharField(blank=True, max_length=20)),
+                ('strike', models.CharField(blank=True, max_length=20)),
+                ('side', models.CharField(choices=[('BUY', 'Buy'), ('SELL', 'Sell')], max_length=4)),
+                ('opened_at', models.DateTimeField()),
+                ('price', models.DecimalField(decimal_places=4, max_digits=12)),
+                ('quantity', models.DecimalField(decimal_places=4, max_digits=15)),
+                ('fees', models.DecimalField(decimal_places=4, default=0, max_digits=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='open_lots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['opened_at'],
+                'indexes': [models.Index(fields=['user', 'position_key'], name='trading_jou_user_id_1003c7_idx')],
+            },
+        ),
+    ]
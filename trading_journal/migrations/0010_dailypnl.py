@@ -0,0 +1,74 @@
+# Generated by Django 4.2.16 on 2026-10-17 04:19
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Q, Sum, Value
+from django.db.models.functions import Abs, Coalesce, TruncDate
+
+
+def fill_daily_pnl(apps, schema_editor):
+    # Roll up the trades that already exist, as rollups.rebuild() does
+    Trade = apps.get_model('trading_journal', 'Trade')
+    DailyPnL = apps.get_model('trading_journal', 'DailyPnL')
+    zero = Value(0, output_field=models.DecimalField())
+    won = Q(profit_loss__gt=0)
+    lost = Q(profit_loss__lt=0)
+    days = (
+        Trade.objects.filter(exit_price__isnull=False)
+        .annotate(day=TruncDate('entry_date'))
+        .values('user_id', 'day')
+        .annotate(
+            trade_count=Count('pk'),
+            wins=Count('pk', filter=won),
+            losses=Count('pk', filter=lost),
+            gross_profit=Coalesce(Sum('profit_loss', filter=won), zero),
+            gross_loss=Coalesce(Abs(Sum('profit_loss', filter=lost)), zero),
+            net_pnl=Sum(Coalesce('profit_loss', zero)),
+            fees=Sum('fees')
+        )
+        .order_by()
+    )
+    DailyPnL.objects.bulk_create([
+        DailyPnL(
+            user_id=row['user_id'], date=row['day'], trade_count=row['trade_count'],
+            wins=row['wins'], losses=row['losses'], gross_profit=row['gross_profit'],
+            gross_loss=row['gross_loss'], net_pnl=row['net_pnl'], fees=row['fees']
+        )
+        for row in days
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('trading_journal', '0009_openlot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyPnL',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('trade_count', models.IntegerField(default=0)),
+                ('wins', models.IntegerField(default=0)),
+                ('losses', models.IntegerField(default=0)),
+                ('gross_profit', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('gross_loss', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('net_pnl', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('fees', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_pnl', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Daily P&L',
+                'ordering': ['date'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailypnl',
+            constraint=models.UniqueConstraint(fields=('user', 'date'), name='unique_daily_pnl'),
+        ),
+        migrations.RunPython(fill_daily_pnl, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.16 on 2026-10-17 05:02
+
+from django.db import migrations, models
+from django.db.models.functions import Length
+
+
+def fill_contracts(apps, schema_editor):
+    # Imported option trades carry their contract, e.g. "CALL 170 21 MAR 25", as notes
+    Trade = apps.get_model('trading_journal', 'Trade')
+    Trade.objects.annotate(notes_length=Length('notes')).filter(
+        trade_type='OPTION', notes__regex=r'^(CALL|PUT) \S+ \S.*$', notes_length__lte=50
+    ).update(contract=models.F('notes'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading_journal', '0010_dailypnl'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='trade',
+            name='unique_trade_natural_key',
+        ),
+        migrations.AddField(
+            model_name='trade',
+            name='contract',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.RunPython(fill_contracts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='trade',
+            constraint=models.UniqueConstraint(fields=('user', 'ticker_symbol', 'contract', 'entry_date', 'exit_date', 'trade_type'), name='unique_trade_natural_key'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.16 on 2026-10-17 05:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading_journal', '0011_trade_contract'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='journalentry',
+            index=models.Index(fields=['user', 'updated_at'], name='trading_jou_user_id_a21d38_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trade',
+            index=models.Index(fields=['user', 'updated_at'], name='trading_jou_user_id_1dea45_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='traderule',
+            index=models.Index(fields=['user', 'updated_at'], name='trading_jou_user_id_139662_idx'),
+        ),
+    ]
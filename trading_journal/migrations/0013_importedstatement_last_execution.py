@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-17 05:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading_journal', '0012_updated_at_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importedstatement',
+            name='last_execution',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -31,6 +31,11 @@ class TradeRule(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'updated_at']),
+        ]
+
     def __str__(self):
         return f"{self.title} - {self.category}"
 
@@ -60,6 +65,8 @@ class Trade(models.Model):
     exit_date = models.DateTimeField(null=True, blank=True)
     trade_type = models.CharField(max_length=10, choices=TRADE_TYPES)
     ticker_symbol = models.CharField(max_length=20)
+    # Option contract of the trade, e.g. "CALL 170 21 MAR 25"; blank for stock
+    contract = models.CharField(max_length=50, blank=True, default='')
     entry_price = models.DecimalField(max_digits=10, decimal_places=2)
     exit_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     position_size = models.DecimalField(max_digits=15, decimal_places=2)
@@ -79,8 +86,23 @@ class Trade(models.Model):
 
     class Meta:
         ordering = ['-entry_date']
+        indexes = [
+            models.Index(fields=['user', 'entry_date']),
+            models.Index(fields=['user', 'updated_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ticker_symbol', 'contract', 'entry_date', 'exit_date', 'trade_type'],
+                name='unique_trade_natural_key'
+            ),
+        ]
 
     def save(self, *args, **kwargs):
+        self.calculate_profit_loss()
+        super().save(*args, **kwargs)
+
+    def calculate_profit_loss(self):
+        """Fill in P&L and the win flag, as save() does, for writers that skip save()"""
         # If we have both entry and exit prices but no P&L, calculate it
         if self.exit_price and self.entry_price and not self.profit_loss:
             # P&L is (exit - entry) * position_size
@@ -92,8 +114,6 @@ class Trade(models.Model):
             # Determine if trade is a win
             self.is_win = self.profit_loss > 0
 
-        super().save(*args, **kwargs)
-
     def __str__(self):
         return f"{self.ticker_symbol} {self.trade_type} - {self.entry_date.date()}"
 
@@ -126,6 +146,112 @@ class JournalEntry(models.Model):
     class Meta:
         verbose_name_plural = 'Journal Entries'
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['user', 'updated_at']),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.date.strftime('%Y-%m-%d')}"
+
+class ImportJob(models.Model):
+    """Model for statement imports processed by the background import worker"""
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('COMPLETED', 'Completed'),
+        ('FAILED', 'Failed')
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='import_jobs')
+    file = models.FileField(upload_to='imports/%Y/%m/')
+    original_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING', db_index=True)
+    rows_parsed = models.IntegerField(default=0)
+    trades_created = models.IntegerField(default=0)
+    duplicates_skipped = models.IntegerField(default=0)
+    executions_skipped = models.IntegerField(default=0)
+    duplicate_statement = models.BooleanField(default=False)
+    errors = models.JSONField(default=list, blank=True)
+    attempts = models.IntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.original_name} - {self.status}"
+
+class ImportedStatement(models.Model):
+    """Model for the ledger of statements a user has already imported"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='imported_statements')
+    content_hash = models.CharField(max_length=64)
+    account = models.CharField(max_length=50, blank=True)
+    period_start = models.DateField(null=True, blank=True)
+    period_end = models.DateField(null=True, blank=True)
+    last_execution = models.DateTimeField(null=True, blank=True)  # Latest execution the statement holds
+    rows_parsed = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'content_hash'], name='unique_statement_per_user'),
+        ]
+
+    def __str__(self):
+        return f"{self.account} {self.period_start} - {self.period_end}"
+
+class OpenLot(models.Model):
+    """Model for position lots still open after an import, matched by later imports"""
+    SIDES = [
+        ('BUY', 'Buy'),
+        ('SELL', 'Sell')
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='open_lots')
+    position_key = models.CharField(max_length=100)
+    ticker_symbol = models.CharField(max_length=20)
+    instrument_type = models.CharField(max_length=10)  # STOCK, PUT or CALL
+    expiration = models.CharField(max_length=20, blank=True)
+    strike = models.CharField(max_length=20, blank=True)
+    side = models.CharField(max_length=4, choices=SIDES)
+    opened_at = models.DateTimeField()
+    price = models.DecimalField(max_digits=12, decimal_places=4)
+    quantity = models.DecimalField(max_digits=15, decimal_places=4)
+    fees = models.DecimalField(max_digits=10, decimal_places=4, default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['opened_at']
+        indexes = [
+            models.Index(fields=['user', 'position_key']),
+        ]
+
+    def __str__(self):
+        return f"{self.position_key} {self.side} {self.quantity} @ {self.price}"
+
+class DailyPnL(models.Model):
+    """Model for per-user daily totals of closed trades, kept in step with Trade"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_pnl')
+    date = models.DateField()  # Day of the trades' entry date
+    trade_count = models.IntegerField(default=0)
+    wins = models.IntegerField(default=0)
+    losses = models.IntegerField(default=0)
+    gross_profit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    gross_loss = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # Stored as a positive amount
+    net_pnl = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    fees = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name_plural = 'Daily P&L'
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='unique_daily_pnl'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.date}: {self.net_pnl}"
@@ -0,0 +1,156 @@
+import base64
+import json
+from collections import OrderedDict
+from functools import partial
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class CountedPaginator(Paginator):
+    """Paginator that takes the row count instead of querying it when the caller already has it."""
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        if count is not None:
+            self.count = count
+
+
+class KeysetPagination(PageNumberPagination):
+    """Page numbers by default, keyset (cursor) pages when ?cursor= is present.
+
+    Keyset pages continue from the last row of the previous page on the
+    current ordering field (from ?ordering= or the model's Meta.ordering),
+    with the primary key as a tiebreaker, so the last page of a large list
+    costs the same as the first. Rows whose ordering value is NULL come last
+    in either direction. Cursor pages only link forwards.
+
+    ?count=false leaves out the total count, and with it the COUNT(*) query,
+    in both modes. A view that has already counted the filtered rows can
+    leave the count in its row_count attribute to save the query as well.
+    """
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def counts_rows(self, request):
+        """Whether the page for this request reports the total count of rows."""
+        return (
+            self.cursor_query_param not in request.query_params
+            and request.query_params.get(self.count_query_param, '').lower() not in ('false', '0')
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.with_count = request.query_params.get(self.count_query_param, '').lower() not in ('false', '0')
+        self.keyset = self.cursor_query_param in request.query_params
+        self.known_count = getattr(view, 'row_count', None)
+        if self.keyset:
+            return self.paginate_keyset(queryset, request)
+        if not self.with_count:
+            return self.paginate_without_count(queryset, request)
+
+        self.django_paginator_class = partial(CountedPaginator, count=self.known_count)
+        rows = super().paginate_queryset(queryset, request, view)
+        self.count = self.page.paginator.count
+        self.next_link = self.get_next_link()
+        self.previous_link = self.get_previous_link()
+        return rows
+
+    def get_paginated_response(self, data):
+        response = OrderedDict()
+        if self.with_count:
+            response['count'] = self.count
+        response['next'] = self.next_link
+        response['previous'] = self.previous_link
+        response['results'] = data
+        return Response(response)
+
+    # Page numbers without COUNT(*): one extra row tells whether there is a next page
+
+    def paginate_without_count(self, queryset, request):
+        page_size = self.get_page_size(request)
+        try:
+            number = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            number = 0
+        if number < 1:
+            raise NotFound('Invalid page.')
+
+        start = (number - 1) * page_size
+        rows = list(queryset[start:start + page_size + 1])
+        if number > 1 and not rows:
+            raise NotFound('Invalid page.')
+        url = request.build_absolute_uri()
+        self.next_link = replace_query_param(url, self.page_query_param, number + 1) if len(rows) > page_size else None
+        if number == 1:
+            self.previous_link = None
+        elif number == 2:
+            self.previous_link = remove_query_param(url, self.page_query_param)
+        else:
+            self.previous_link = replace_query_param(url, self.page_query_param, number - 1)
+        return rows[:page_size]
+
+    # Keyset pages
+
+    def get_ordering_field(self, queryset):
+        for ordering in list(queryset.query.order_by) + list(queryset.model._meta.ordering):
+            if isinstance(ordering, str):
+                return ordering.lstrip('-'), ordering.startswith('-')
+        return queryset.model._meta.pk.name, False
+
+    def encode_cursor(self, value, pk):
+        payload = json.dumps([None if value is None else str(value), pk], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, cursor, field):
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return (None if value is None else field.to_python(value)), int(pk)
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound('Invalid cursor.')
+
+    def paginate_keyset(self, queryset, request):
+        page_size = self.get_page_size(request)
+        name, descending = self.get_ordering_field(queryset)
+        field = queryset.model._meta.get_field(name)
+        pk = queryset.model._meta.pk.name
+        value_order = F(name).desc(nulls_last=True) if descending else F(name).asc(nulls_last=True)
+        if not self.with_count:
+            self.count = None
+        else:
+            self.count = queryset.count() if self.known_count is None else self.known_count
+        queryset = queryset.order_by(value_order, f'-{pk}' if descending else pk)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            value, last_pk = self.decode_cursor(cursor, field)
+            after_pk = Q(**{f'{pk}__lt' if descending else f'{pk}__gt': last_pk})
+            if value is None:
+                queryset = queryset.filter(Q(**{f'{name}__isnull': True}) & after_pk)
+            else:
+                after_value = Q(**{f'{name}__lt' if descending else f'{name}__gt': value})
+                queryset = queryset.filter(
+                    after_value | (Q(**{name: value}) & after_pk) | Q(**{f'{name}__isnull': True})
+                )
+
+        rows = list(queryset[:page_size + 1])
+        self.previous_link = None
+        self.next_link = None
+        if len(rows) > page_size:
+            last = rows[page_size - 1]
+            # Rows are model instances, or dicts when the view paginates .values()
+            if isinstance(last, dict):
+                value, last_pk = last[name], last[queryset.model._meta.pk.attname]
+            else:
+                value, last_pk = getattr(last, name), last.pk
+            self.next_link = replace_query_param(
+                request.build_absolute_uri(), self.cursor_query_param,
+                self.encode_cursor(value, last_pk)
+            )
+        return rows[:page_size]
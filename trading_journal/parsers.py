@@ -0,0 +1,379 @@
+import codecs
+import csv
+import hashlib
+import io
+import logging
+import re
+import sys
+from collections import namedtuple
+from datetime import datetime
+
+from .matching import LotMatcher
+
+logger = logging.getLogger(__name__)
+
+
+class Execution(namedtuple('Execution', [
+    'exec_time', 'spread', 'side', 'qty', 'pos_effect', 'symbol', 'exp', 'strike', 'type', 'price', 'fees'
+], defaults=[0.0])):
+    """One trade history fill.
+
+    A plain tuple costs a fraction of the memory of a dict per row, and the
+    repeated text columns are interned so every row shares one copy. It
+    still reads like the execution dicts the matcher also accepts:
+    execution['symbol'], execution.get('fees') and dict(execution) work.
+    """
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return getattr(self, key)
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in self._fields else default
+
+    def keys(self):
+        return self._fields
+
+
+class ThinkOrSwimParser:
+    """Streaming parser for ThinkOrSwim account statements.
+
+    The statement is read in fixed-size chunks and scanned in a single forward
+    pass, so no copy of the file's text is ever held in memory. That pass
+    yields the executions of the "Account Trade History" section one at a
+    time, records the byte range of every section and collects the Cash
+    Balance fees, the Profits and Losses rows and the Account Summary.
+    Executions that are kept, by load_executions() and parse(), are stored
+    as compact Execution tuples, so memory still grows with the number of
+    fills, at a couple of hundred bytes each.
+    """
+    TRADE_HISTORY = 'Account Trade History'
+    CASH_BALANCE = 'Cash Balance'
+    PROFITS_AND_LOSSES = 'Profits and Losses'
+    ACCOUNT_SUMMARY = 'Account Summary'
+    # Sections made of "name,value" rows rather than a header and records
+    KEY_VALUE_SECTIONS = (ACCOUNT_SUMMARY, 'Forex Account Summary')
+    EXEC_TIME_FORMAT = '%m/%d/%y %H:%M:%S'
+    STATEMENT_DATE_FORMAT = '%m/%d/%y'
+    STATEMENT_HEADER = re.compile(
+        r'Account Statement for (?P<account>\S+).*? since (?P<start>[\d/]+) through (?P<end>[\d/]+)'
+    )
+    # Cash Balance description of a fill, e.g. "tIP SOLD -5 VAL @34.96"
+    TRADE_DESCRIPTION = re.compile(r'\b(?P<side>BOT|SOLD) (?P<qty>[+-]?[\d,.]+) (?P<symbol>\S+)')
+    CHUNK_SIZE = 64 * 1024
+    # How many executions to parse between progress callbacks
+    PROGRESS_EVERY = 5000
+
+    def __init__(self, source, chunk_size=None):
+        # source may be a str, a text/binary file object or a Django UploadedFile
+        self.source = source
+        self.chunk_size = chunk_size or self.CHUNK_SIZE
+        self.trades = []
+        self.rows_parsed = 0
+        self.errors = []
+        # Account and covered dates from the statement header, once it is read
+        self.statement_info = None
+        # Section title -> (start, end) byte offsets, header row included
+        self.sections = {}
+        # (exec time, side, symbol) -> fees charged for the fill
+        self.fees = {}
+        self.profits_and_losses = []
+        self.account_summary = {}
+        self._offset = 0
+
+    def _iter_chunks(self):
+        """Yield the raw statement in chunks of at most chunk_size."""
+        source = self.source
+        if isinstance(source, str):
+            for start in range(0, len(source), self.chunk_size):
+                yield source[start:start + self.chunk_size]
+        elif hasattr(source, 'chunks'):
+            yield from source.chunks(self.chunk_size)
+        else:
+            if hasattr(source, 'seek'):
+                source.seek(0)
+            while True:
+                chunk = source.read(self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def _iter_lines(self):
+        """Decode the chunks and yield complete lines, newline included.
+
+        self._offset tracks the byte offset just past the last line yielded.
+        """
+        decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        pending = ''
+        self._offset = 0
+        for chunk in self._iter_chunks():
+            if isinstance(chunk, bytes):
+                if not self._offset and not pending and chunk.startswith(codecs.BOM_UTF8):
+                    self._offset = len(codecs.BOM_UTF8)
+                chunk = decoder.decode(chunk)
+            lines = (pending + chunk).split('\n')
+            pending = lines.pop()
+            for line in lines:
+                line += '\n'
+                self._offset += len(line.encode('utf-8'))
+                yield line
+        pending += decoder.decode(b'', final=True)
+        if pending:
+            self._offset += len(pending.encode('utf-8'))
+            yield pending
+
+    def fingerprint(self):
+        """Return the SHA-256 hex digest of the raw statement."""
+        digest = hashlib.sha256()
+        for chunk in self._iter_chunks():
+            digest.update(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+        return digest.hexdigest()
+
+    def _parse_statement_header(self, row):
+        match = self.STATEMENT_HEADER.match(','.join(row).strip())
+        if not match:
+            return
+        try:
+            self.statement_info = {
+                'account': match.group('account'),
+                'period_start': datetime.strptime(match.group('start'), self.STATEMENT_DATE_FORMAT).date(),
+                'period_end': datetime.strptime(match.group('end'), self.STATEMENT_DATE_FORMAT).date(),
+            }
+        except ValueError:
+            pass
+
+    def _iter_rows(self):
+        """Yield (start, end, row) for each CSV row, with byte offsets."""
+        start = 0
+        for row in csv.reader(self._iter_lines()):
+            if not start and row and row[0].startswith('\ufeff'):
+                row[0] = row[0][1:]
+            yield start, self._offset, row
+            start = self._offset
+
+    @staticmethod
+    def _is_blank(row):
+        return not any(cell.strip() for cell in row)
+
+    @staticmethod
+    def _parse_number(value):
+        value = value.strip()
+        negative = value.startswith('(') and value.endswith(')')
+        number = float(value.strip('()').replace('$', '').replace(',', '').replace('+', '').replace('%', ''))
+        return -number if negative else number
+
+    def _parse_amount(self, value):
+        """Parse an optional money column; blanks count as zero."""
+        return self._parse_number(value) if value.strip() else 0.0
+
+    def _parse_value(self, value):
+        try:
+            return self._parse_number(value)
+        except ValueError:
+            return value.strip()
+
+    @staticmethod
+    def _cell(row, columns, name):
+        index = columns.get(name)
+        if index is None or index >= len(row):
+            return ''
+        return row[index].strip()
+
+    def _parse_execution(self, row, columns):
+        def cell(name):
+            return self._cell(row, columns, name)
+
+        def text(name):
+            return sys.intern(cell(name)) or None
+
+        return Execution(
+            exec_time=datetime.strptime(cell('Exec Time'), self.EXEC_TIME_FORMAT),
+            spread=sys.intern(cell('Spread')),
+            side=sys.intern(cell('Side')),
+            qty=abs(self._parse_number(cell('Qty'))),
+            pos_effect=sys.intern(cell('Pos Effect')),
+            symbol=sys.intern(cell('Symbol')),
+            exp=text('Exp'),
+            strike=text('Strike'),
+            type=sys.intern(cell('Type')),
+            price=self._parse_number(cell('Price')),
+        )
+
+    def _collect_fee(self, row, columns):
+        """Record the fees of a Cash Balance trade row."""
+        def cell(name):
+            return self._cell(row, columns, name)
+
+        if cell('TYPE') != 'TRD':
+            return
+        match = self.TRADE_DESCRIPTION.search(cell('DESCRIPTION'))
+        if not match:
+            return
+        exec_time = datetime.strptime(f"{cell('DATE')} {cell('TIME')}", self.EXEC_TIME_FORMAT)
+        side = 'BUY' if match.group('side') == 'BOT' else 'SELL'
+        key = (exec_time, side, sys.intern(match.group('symbol')))
+        # Fees are listed as negative cash amounts
+        fee = -(self._parse_amount(cell('Misc Fees')) + self._parse_amount(cell('Commissions & Fees')))
+        self.fees[key] = self.fees.get(key, 0.0) + fee
+
+    def _collect_row(self, section, row, columns):
+        if section == self.CASH_BALANCE:
+            self._collect_fee(row, columns)
+        elif section == self.PROFITS_AND_LOSSES:
+            self.profits_and_losses.append({
+                name: self._parse_value(self._cell(row, columns, name)) for name in columns
+            })
+        elif section == self.ACCOUNT_SUMMARY:
+            self.account_summary[row[0].strip()] = self._parse_value(row[1]) if len(row) > 1 else ''
+
+    def iter_executions(self):
+        """Scan the statement once, yielding trade history executions in file order.
+
+        A section starts with a single-cell title row that follows a blank row
+        and is itself followed by data, and runs until the next blank row.
+        """
+        section = None
+        columns = None
+        title = None
+        previous_blank = True
+        for start, end, row in self._iter_rows():
+            blank = self._is_blank(row)
+
+            if title is not None:
+                name, title_start = title
+                title = None
+                if not blank:
+                    section, columns = name, None
+                    self.sections[name] = (title_start, end)
+            if blank:
+                section = None
+                previous_blank = True
+                continue
+
+            if section is None:
+                if self.statement_info is None and row[0].startswith('Account Statement for'):
+                    self._parse_statement_header(row)
+                if previous_blank and self._is_blank(row[1:]):
+                    title = (row[0].strip(), start)
+                previous_blank = False
+                continue
+            previous_blank = False
+            self.sections[section] = (self.sections[section][0], end)
+
+            if columns is None and section not in self.KEY_VALUE_SECTIONS:
+                columns = {name.strip(): i for i, name in enumerate(row) if name.strip()}
+                continue
+            if section != self.TRADE_HISTORY:
+                try:
+                    self._collect_row(section, row, columns)
+                except (ValueError, IndexError) as e:
+                    self.errors.append(f"{section}: {str(e)}")
+                continue
+
+            try:
+                execution = self._parse_execution(row, columns)
+            except (ValueError, KeyError) as e:
+                self.errors.append(f"Row {self.rows_parsed + 1}: {str(e)}")
+                continue
+            self.rows_parsed += 1
+            yield execution
+
+        if self.TRADE_HISTORY not in self.sections:
+            logger.warning('No trade history section found')
+
+    def read_section(self, title):
+        """Return the rows of an indexed section by seeking to its byte range.
+
+        Call after a scan; the statement is not read again from the start.
+        """
+        start, end = self.sections[title]
+        if isinstance(self.source, str):
+            data = self.source.encode('utf-8')[start:end]
+        else:
+            self.source.seek(start)
+            data = self.source.read(end - start)
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        return list(csv.reader(io.StringIO(data)))
+
+    def _apply_fees(self, executions):
+        """Attach Cash Balance fees to executions, split by quantity within a fill.
+
+        executions must be sorted by time, so the executions of a fill sit
+        together and only one timestamp's quantities are totalled at a time.
+        Fees are taken out of self.fees as they are attached.
+        """
+        start = 0
+        while start < len(executions):
+            end = start + 1
+            while end < len(executions) and executions[end].exec_time == executions[start].exec_time:
+                end += 1
+            quantities = {}
+            for execution in executions[start:end]:
+                key = (execution.side, execution.symbol)
+                quantities[key] = quantities.get(key, 0.0) + execution.qty
+            fees = {key: self.fees.pop((executions[start].exec_time,) + key, 0.0) for key in quantities}
+            for i in range(start, end):
+                execution = executions[i]
+                key = (execution.side, execution.symbol)
+                if fees[key] and quantities[key]:
+                    executions[i] = execution._replace(fees=fees[key] * execution.qty / quantities[key])
+            start = end
+
+    def load_executions(self, progress=None, include=None):
+        """Scan the statement and return its executions, as Execution tuples, in chronological order.
+
+        If given, progress is called with the number of executions parsed so
+        far every PROGRESS_EVERY rows, and only executions for which include
+        returns True are kept.
+        """
+        executions = []
+        for execution in self.iter_executions():
+            if include is None or include(execution):
+                executions.append(execution)
+            if progress and self.rows_parsed % self.PROGRESS_EVERY == 0:
+                progress(self.rows_parsed)
+        # The statement lists the newest executions first; reverse it so the
+        # stable sort keeps executions sharing a timestamp in the order they happened
+        executions.reverse()
+        executions.sort(key=lambda execution: execution.exec_time)
+        self._apply_fees(executions)
+        # Fees of fills that were left out are no longer needed either
+        self.fees = {}
+        return executions
+
+    def parse(self, method='fifo', progress=None, include=None):
+        """Parse the ThinkOrSwim statement and match opening and closing executions."""
+        try:
+            executions = self.load_executions(progress=progress, include=include)
+            result = LotMatcher(method).match(executions)
+            self.trades = result['trades']
+            return result
+
+        except Exception as e:
+            self.errors.append(f"Error parsing CSV: {str(e)}")
+            return {'trades': [], 'open_lots': []}
+
+
+def read_statement(path):
+    """Parse a statement file and return its executions in chronological order.
+
+    The executions come with the fields the statement ledger records for the
+    file. Kept at module level, away from the ORM, so it can run in a
+    process pool.
+    """
+    with open(path, 'rb') as statement:
+        parser = ThinkOrSwimParser(statement)
+        content_hash = parser.fingerprint()
+        executions = parser.load_executions()
+    info = parser.statement_info or {}
+    return executions, {
+        'content_hash': content_hash,
+        'account': info.get('account', ''),
+        'period_start': info.get('period_start'),
+        'period_end': info.get('period_end'),
+        'last_execution': max((e['exec_time'] for e in executions), default=None),
+        'rows_parsed': parser.rows_parsed,
+    }
@@ -0,0 +1,169 @@
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.functions import Coalesce
+
+from .cache import data_version
+from .models import Trade
+
+STATE_TIMEOUT = 24 * 60 * 60
+# Trades queued for the cached metrics before they are rebuilt instead
+TAIL_LIMIT = 1000
+
+
+class RollingMetrics:
+    """Prefix sums over a user's closed trades, in the order they closed.
+
+    Any window's count, wins, P&L, gross profit and gross loss is the
+    difference of two prefix sums, so every rolling series comes out of one
+    vectorized pass. A trade that closes after all the others is appended in
+    constant time.
+    """
+    FIELDS = ('wins', 'pnl', 'gross_profit', 'gross_loss')
+
+    def __init__(self, times=(), pnl=()):
+        self.times = []
+        self.sums = {field: [0.0] for field in self.FIELDS}
+        for closed_at, profit_loss in zip(times, pnl):
+            self.append(closed_at, profit_loss)
+
+    def __len__(self):
+        return len(self.times)
+
+    def append(self, closed_at, profit_loss):
+        """Add a trade; returns False if it closed before the last one recorded."""
+        if self.times and closed_at < self.times[-1]:
+            return False
+        profit_loss = float(profit_loss or 0)
+        self.times.append(closed_at)
+        for field, value in (
+            ('wins', float(profit_loss > 0)),
+            ('pnl', profit_loss),
+            ('gross_profit', max(profit_loss, 0.0)),
+            ('gross_loss', max(-profit_loss, 0.0)),
+        ):
+            sums = self.sums[field]
+            sums.append(sums[-1] + value)
+        return True
+
+    def window_starts(self, window, unit='trades'):
+        """Index of the first trade in the window ending at each trade."""
+        end = np.arange(1, len(self.times) + 1)
+        if unit == 'days':
+            times = np.array(self.times, dtype=np.int64)
+            return np.searchsorted(times, times - window * 86400, side='right')
+        return np.maximum(end - window, 0)
+
+    def series(self, window, unit='trades'):
+        """Rolling win rate, expectancy and profit factor at every trade.
+
+        unit is 'trades' for the last window trades or 'days' for the trades
+        closed in the window days up to and including each one.
+        """
+        start = self.window_starts(window, unit)
+        end = np.arange(1, len(self.times) + 1)
+        sums = {field: np.array(values) for field, values in self.sums.items()}
+        totals = {field: values[end] - values[start] for field, values in sums.items()}
+        count = end - start
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            profit_factor = totals['gross_profit'] / totals['gross_loss']
+        profit_factor[~np.isfinite(profit_factor)] = np.nan
+        return {
+            'times': np.array(self.times, dtype=np.int64).astype('datetime64[s]'),
+            'trades': count,
+            'win_rate': totals['wins'] / count * 100,
+            'expectancy': totals['pnl'] / count,
+            'profit_factor': profit_factor,
+        }
+
+
+def _state_key(user_id):
+    return f'trading_journal:rolling:{user_id}'
+
+
+def _tail_key(user_id):
+    return f'trading_journal:rolling-tail:{user_id}'
+
+
+def _closed_trades(user_id):
+    return Trade.objects.filter(user_id=user_id, exit_price__isnull=False).annotate(
+        closed_at=Coalesce('exit_date', 'entry_date')
+    ).order_by('closed_at', 'pk').values_list('closed_at', 'profit_loss')
+
+
+def _store(user_id, version, metrics):
+    cache.set_many({
+        _state_key(user_id): {'version': version, 'metrics': metrics},
+        _tail_key(user_id): {
+            'base': version,
+            'version': version,
+            'last': metrics.times[-1] if metrics.times else None,
+            'trades': [],
+        },
+    }, STATE_TIMEOUT)
+
+
+def rolling_metrics(user_id):
+    """The user's RollingMetrics, rebuilt with one query unless the cached copy is current.
+
+    The cache holds the metrics as of some version plus a short tail of
+    trades appended since. The tail is folded into the metrics here, so
+    writers never have to load or re-serialize the whole prefix sums.
+    """
+    version = data_version(user_id)
+    tail = cache.get(_tail_key(user_id))
+    if tail is not None and tail['version'] == version:
+        state = cache.get(_state_key(user_id))
+        if state is not None and state['version'] == tail['base']:
+            metrics = state['metrics']
+            if tail['trades']:
+                for closed_at, profit_loss in tail['trades']:
+                    metrics.append(closed_at, profit_loss)
+                _store(user_id, version, metrics)
+            return metrics
+
+    metrics = RollingMetrics()
+    for closed_at, profit_loss in _closed_trades(user_id):
+        metrics.append(int(closed_at.timestamp()), profit_loss)
+    _store(user_id, version, metrics)
+    return metrics
+
+
+def record_trades(user_id, trades, previous_version, version):
+    """Append newly created trades to the cached metrics instead of rebuilding them.
+
+    previous_version is the user's data version from before the trades were
+    written and version the one bump_version returned for the write. The trades are only queued on the cached tail if it was current
+    at that version and every trade closes after the ones already recorded;
+    otherwise the cache is dropped and rebuilt on the next request. Each
+    write costs as much as the tail, however long the trade history is.
+    Runs once the current transaction commits, after the version bump of
+    the write.
+    """
+    transaction.on_commit(lambda: _append_trades(user_id, list(trades), previous_version, version))
+
+
+def _append_trades(user_id, trades, previous_version, version):
+    tail = cache.get(_tail_key(user_id))
+    if tail is None or tail['version'] != previous_version:
+        return False
+
+    closed = sorted(
+        (int((trade.exit_date or trade.entry_date).timestamp()), trade.pk or 0, trade.profit_loss)
+        for trade in trades if trade.exit_price is not None
+    )
+    for closed_at, _, profit_loss in closed:
+        if tail['last'] is not None and closed_at < tail['last']:
+            cache.delete(_tail_key(user_id))
+            return False
+        tail['trades'].append((closed_at, profit_loss))
+        tail['last'] = closed_at
+    if len(tail['trades']) > TAIL_LIMIT:
+        # Nobody has read the metrics for a while; rebuilding is cheaper
+        cache.delete(_tail_key(user_id))
+        return False
+    # Stamp the write's own version; a later write may already have bumped it again
+    tail['version'] = version
+    cache.set(_tail_key(user_id), tail, STATE_TIMEOUT)
+    return True
@@ -0,0 +1,135 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Abs, Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import DailyPnL, Trade
+
+ZERO = Decimal('0')
+COUNTERS = ('trade_count', 'wins', 'losses')
+AMOUNTS = ('gross_profit', 'gross_loss', 'net_pnl', 'fees')
+CENT = Decimal('0.01')
+
+_paused = ContextVar('rollup_paused', default=False)
+
+
+@contextmanager
+def paused():
+    """Stop the model signals from updating the rollup and cache version.
+
+    For bulk writers that refresh both themselves once they are done.
+    """
+    token = _paused.set(True)
+    try:
+        yield
+    finally:
+        _paused.reset(token)
+
+
+def is_paused():
+    return _paused.get()
+
+
+def trading_day(entry_date):
+    """The day a trade is rolled up under.
+
+    entry_date may still be a string if the trade was saved with one.
+    """
+    entry_date = Trade._meta.get_field('entry_date').to_python(entry_date)
+    if timezone.is_aware(entry_date):
+        return timezone.localtime(entry_date).date()
+    return entry_date.date()
+
+
+def contribution(trade):
+    """What a trade adds to its day's DailyPnL row, or None for open trades.
+
+    trade may be a Trade or a dict of its field values.
+    """
+    values = trade if isinstance(trade, dict) else trade.__dict__
+    if values.get('exit_price') is None or values.get('entry_date') is None:
+        return None
+    # Trade.save can leave a float here, so round it the way the column does
+    profit_loss = Decimal(str(values.get('profit_loss') or 0)).quantize(CENT)
+    return values['user_id'], trading_day(values['entry_date']), {
+        'trade_count': 1,
+        'wins': int(profit_loss > 0),
+        'losses': int(profit_loss < 0),
+        'gross_profit': max(profit_loss, ZERO),
+        'gross_loss': max(-profit_loss, ZERO),
+        'net_pnl': profit_loss,
+        'fees': Decimal(str(values.get('fees') or 0)).quantize(CENT),
+    }
+
+
+def apply_delta(user_id, day, delta, sign=1):
+    """Add (sign=1) or remove (sign=-1) a contribution from a day's row."""
+    with transaction.atomic():
+        DailyPnL.objects.get_or_create(user_id=user_id, date=day)
+        rows = DailyPnL.objects.filter(user_id=user_id, date=day)
+        rows.update(**{field: F(field) + sign * value for field, value in delta.items()})
+        if sign < 0:
+            rows.filter(trade_count__lte=0).delete()
+
+
+def refresh_days(user, days):
+    """Recompute the rollup rows of the given days from the Trade table.
+
+    Used by bulk paths such as imports, which write trades without sending
+    model signals. Costs one grouped query and one write per call, however
+    many trades the days hold.
+    """
+    days = set(days)
+    if not days:
+        return
+    with transaction.atomic():
+        DailyPnL.objects.filter(user=user, date__in=days).delete()
+        DailyPnL.objects.bulk_create(
+            _build_rows(Trade.objects.filter(user=user, entry_date__date__in=days))
+        )
+
+
+def rebuild(users=None):
+    """Rebuild the rollup from scratch, for all users or only the given ones."""
+    trades = Trade.objects.all()
+    rollups = DailyPnL.objects.all()
+    if users is not None:
+        trades = trades.filter(user__in=users)
+        rollups = rollups.filter(user__in=users)
+    with transaction.atomic():
+        rollups.delete()
+        return len(DailyPnL.objects.bulk_create(_build_rows(trades), batch_size=500))
+
+
+def _build_rows(trades):
+    profit_loss = Coalesce('profit_loss', Value(ZERO))
+    won = Q(profit_loss__gt=0)
+    lost = Q(profit_loss__lt=0)
+    days = (
+        trades.filter(exit_price__isnull=False)
+        .annotate(day=TruncDate('entry_date'))
+        .values('user_id', 'day')
+        .annotate(
+            trade_count=Count('pk'),
+            wins=Count('pk', filter=won),
+            losses=Count('pk', filter=lost),
+            gross_profit=Coalesce(Sum('profit_loss', filter=won), Value(ZERO)),
+            gross_loss=Coalesce(Abs(Sum('profit_loss', filter=lost)), Value(ZERO)),
+            net_pnl=Sum(profit_loss),
+            fees=Sum('fees')
+        )
+        .order_by()
+    )
+    return [
+        DailyPnL(
+            user_id=row['user_id'],
+            date=row['day'],
+            **{field: row[field] for field in COUNTERS + AMOUNTS}
+        )
+        for row in days
+    ]
+
@@ -1,6 +1,102 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import TradeRule, Tag, Trade, JournalEntry, TagCategory
+from .importers import NATURAL_KEY
+from .models import TradeRule, Tag, Trade, JournalEntry, TagCategory, ImportJob
+
+def requested_fields(request, name='fields'):
+    """Comma-separated field names from a query parameter, or None when it is absent."""
+    if request is None or name not in request.query_params:
+        return None
+    return [field for field in request.query_params[name].split(',') if field]
+
+class SparseFieldsMixin:
+    """Limit a serializer's output to the fields named in ?fields= on GET requests.
+
+    Nested relations listed in ?fields= are represented by their ids unless
+    they are also named in ?expand=.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        fields = requested_fields(request)
+        if fields is None or request.method != 'GET':
+            return
+        expand = requested_fields(request, 'expand') or []
+        for name in list(self.fields):
+            if name not in fields:
+                self.fields.pop(name)
+            elif name not in expand and isinstance(self.fields[name], serializers.ListSerializer):
+                source = self.fields[name].source
+                self.fields[name] = serializers.PrimaryKeyRelatedField(
+                    **({} if source == name else {'source': source}), many=True, read_only=True
+                )
+
+def value_columns(serializer, fields):
+    """Model columns to select with .values() for the scalar fields among fields."""
+    pk = serializer.Meta.model._meta.pk.attname
+    columns = [pk]
+    for name in fields:
+        field = serializer.fields.get(name)
+        if field is not None and not field.write_only and not isinstance(field, serializers.ListSerializer):
+            if field.source not in columns:
+                columns.append(field.source)
+    return columns
+
+def values_representation(serializer, rows, fields, expand):
+    """Build the ?fields= representation of .values() rows without per-row serializers.
+
+    Scalar columns are copied straight from the rows; only dates, datetimes
+    and decimals go through their serializer field's formatting. Each nested
+    relation costs one query for the links of all rows, plus one for the
+    related objects when it is expanded.
+    """
+    model = serializer.Meta.model
+    pk = model._meta.pk.attname
+    converters = {}
+    relations = {}
+    for name in fields:
+        field = serializer.fields.get(name)
+        if field is None or field.write_only:
+            continue
+        if isinstance(field, serializers.ListSerializer):
+            relations[name] = field
+        elif isinstance(field, (serializers.DateTimeField, serializers.DateField, serializers.DecimalField)):
+            converters[name] = (field.source, field.to_representation)
+        else:
+            converters[name] = (field.source, None)
+
+    results = []
+    for row in rows:
+        item = {}
+        for name, (source, convert) in converters.items():
+            value = row[source]
+            item[name] = convert(value) if convert is not None and value is not None else value
+        results.append(item)
+
+    ids = [row[pk] for row in rows]
+    for name, field in relations.items():
+        m2m = model._meta.get_field(field.source)
+        source, target = m2m.m2m_column_name(), m2m.m2m_reverse_name()
+        links = {}
+        for row_id, target_id in m2m.remote_field.through.objects.filter(
+            **{f'{source}__in': ids}
+        ).values_list(source, target):
+            links.setdefault(row_id, []).append(target_id)
+
+        if name in expand:
+            related = m2m.related_model.objects.filter(
+                pk__in={target_id for targets in links.values() for target_id in targets}
+            )
+            if m2m.related_model is Tag:
+                # TagSerializer reads the category of every tag
+                related = related.select_related('category')
+            objects = {obj.pk: field.child.to_representation(obj) for obj in related}
+            for item, row in zip(results, rows):
+                item[name] = [objects[target_id] for target_id in links.get(row[pk], [])]
+        else:
+            for item, row in zip(results, rows):
+                item[name] = links.get(row[pk], [])
+    return results
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -36,7 +132,7 @@ class TradeRuleSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ('user', 'created_at', 'updated_at')
 
-class TradeSerializer(serializers.ModelSerializer):
+class TradeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     tags = TagSerializer(many=True, read_only=True)
     rules_followed = TradeRuleSerializer(many=True, read_only=True)
     tag_ids = serializers.PrimaryKeyRelatedField(
@@ -67,6 +163,8 @@ class TradeSerializer(serializers.ModelSerializer):
         Custom validation to ensure exit price is greater than entry price for long trades
         and vice versa for short trades
         """
+        self.check_natural_key(data)
+
         if 'exit_price' in data and data.get('exit_price'):
             entry_price = data.get('entry_price')
             exit_price = data.get('exit_price')
@@ -83,7 +181,45 @@ class TradeSerializer(serializers.ModelSerializer):
 
         return data
 
-class JournalEntrySerializer(serializers.ModelSerializer):
+    def check_natural_key(self, data):
+        """Reject a trade that would repeat another of the user's trades' natural key"""
+        request = self.context.get('request')
+        if request is None:
+            return
+        key = {
+            field: data[field] if field in data else getattr(self.instance, field, '')
+            for field in NATURAL_KEY
+        }
+        # The database treats open trades (no exit date) as never equal
+        if key['entry_date'] in ('', None) or key['exit_date'] in ('', None):
+            return
+        others = Trade.objects.filter(user=request.user, **key)
+        if self.instance is not None:
+            others = others.exclude(pk=self.instance.pk)
+        if others.exists():
+            raise serializers.ValidationError(
+                "A trade with the same ticker, contract, entry date, exit date and type already exists"
+            )
+
+class BulkTradeSerializer(TradeSerializer):
+    """TradeSerializer for bulk writes.
+
+    Tag and rule ids are plain integers here; the bulk writer checks them,
+    and natural key collisions, for the whole batch in one query instead of
+    one per item. On updates the add_ and remove_ lists change links
+    without replacing the others.
+    """
+    tag_ids = serializers.ListField(child=serializers.IntegerField(), write_only=True, required=False)
+    rule_ids = serializers.ListField(child=serializers.IntegerField(), write_only=True, required=False)
+    add_tag_ids = serializers.ListField(child=serializers.IntegerField(), write_only=True, required=False)
+    remove_tag_ids = serializers.ListField(child=serializers.IntegerField(), write_only=True, required=False)
+    add_rule_ids = serializers.ListField(child=serializers.IntegerField(), write_only=True, required=False)
+    remove_rule_ids = serializers.ListField(child=serializers.IntegerField(), write_only=True, required=False)
+
+    def check_natural_key(self, data):
+        """Checked for the whole batch by the bulk writer"""
+
+class JournalEntrySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     tags = TagSerializer(many=True, read_only=True)
     tag_ids = serializers.PrimaryKeyRelatedField(
         many=True,
@@ -100,4 +236,13 @@ class JournalEntrySerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
-        return super().create(validated_data) 
\ No newline at end of file
+        return super().create(validated_data)
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ImportJob
+        fields = [
+            'id', 'original_name', 'status', 'rows_parsed', 'trades_created',
+            'duplicates_skipped', 'executions_skipped', 'duplicate_statement', 'errors', 'attempts', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
@@ -0,0 +1,69 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import bump_version
+from .models import JournalEntry, Tag, TagCategory, Trade, TradeRule
+from .rollups import apply_delta, contribution, is_paused
+
+
+@receiver(pre_save, sender=Trade)
+def remember_rollup_contribution(sender, instance, raw=False, **kwargs):
+    """Keep what the stored trade contributed, so post_save can take it back out."""
+    instance._previous_contribution = None
+    if raw or instance.pk is None or is_paused():
+        return
+    previous = Trade.objects.filter(pk=instance.pk).values(
+        'user_id', 'entry_date', 'exit_price', 'profit_loss', 'fees'
+    ).first()
+    if previous:
+        instance._previous_contribution = contribution(previous)
+
+
+@receiver(post_save, sender=Trade)
+def update_rollup_on_save(sender, instance, raw=False, **kwargs):
+    if raw or is_paused():
+        return
+    previous = getattr(instance, '_previous_contribution', None)
+    current = contribution(instance)
+    if previous == current:
+        return
+    if previous is not None:
+        apply_delta(*previous, sign=-1)
+    if current is not None:
+        apply_delta(*current)
+
+
+@receiver(post_delete, sender=Trade)
+def update_rollup_on_delete(sender, instance, **kwargs):
+    if is_paused():
+        return
+    current = contribution(instance)
+    if current is not None:
+        apply_delta(*current, sign=-1)
+
+
+def _owner_id(instance):
+    return getattr(instance, 'user_id', None) or getattr(instance, 'created_by_id', None)
+
+
+@receiver(post_save, sender=Trade)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=TagCategory)
+@receiver(post_save, sender=TradeRule)
+@receiver(post_save, sender=JournalEntry)
+@receiver(post_delete, sender=Trade)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=TagCategory)
+@receiver(post_delete, sender=TradeRule)
+@receiver(post_delete, sender=JournalEntry)
+def bump_version_on_write(sender, instance, raw=False, **kwargs):
+    if not raw and not is_paused():
+        bump_version(_owner_id(instance))
+
+
+@receiver(m2m_changed, sender=Trade.tags.through)
+@receiver(m2m_changed, sender=Trade.rules_followed.through)
+@receiver(m2m_changed, sender=JournalEntry.tags.through)
+def bump_version_on_m2m_change(sender, instance, action, **kwargs):
+    if action.startswith('post_') and not is_paused():
+        bump_version(_owner_id(instance))
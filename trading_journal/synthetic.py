@@ -0,0 +1,138 @@
+import random
+from datetime import datetime, timedelta
+
+STOCK_SYMBOLS = [
+    'AAPL', 'ADI', 'AMZN', 'ANF', 'CMG', 'ENPH', 'GILD', 'GOOGL', 'HIMS', 'KMB',
+    'LRCX', 'NLY', 'NOG', 'NVDA', 'PYPL', 'SMCI', 'SPY', 'U', 'VAL', 'WST',
+]
+OPTION_EXPIRATIONS = ['7 MAR 25', '21 MAR 25', '17 APR 25', '16 MAY 25', '20 JUN 25']
+DISCLAIMER = (
+    'This document was exported from the paperMoney® platform which provides a simulated '
+    'trading environment. All data contained herein is for educational and entertainment purposes only.'
+)
+
+
+class StatementGenerator:
+    """Build synthetic ThinkOrSwim statements laid out like a real export.
+
+    Positions in stocks and options (with expiration and strike) are opened
+    and then closed in one or more partial fills, with several symbols open at
+    the same time so their executions interleave. Every fill also gets a Cash
+    Balance row carrying its fees. The same seed always gives the same file.
+    """
+    OPEN_PROBABILITY = 0.45
+    OPTION_PROBABILITY = 0.3
+    MAX_OPEN_POSITIONS = 25
+
+    def __init__(self, executions=1000, seed=0, account='D-00000000', start=datetime(2025, 1, 2, 9, 30)):
+        self.size = executions
+        self.random = random.Random(seed)
+        self.account = account
+        self.start = start
+
+    def _next_time(self, now):
+        now += timedelta(seconds=self.random.randint(1, 90))
+        if now.hour >= 16:
+            now = (now + timedelta(days=1)).replace(hour=9, minute=30, second=0)
+            while now.weekday() >= 5:
+                now += timedelta(days=1)
+        return now
+
+    def _new_position(self):
+        symbol = self.random.choice(STOCK_SYMBOLS)
+        if self.random.random() < self.OPTION_PROBABILITY:
+            position = {
+                'symbol': symbol,
+                'type': self.random.choice(['PUT', 'CALL']),
+                'exp': self.random.choice(OPTION_EXPIRATIONS),
+                'strike': str(self.random.randrange(20, 400, 5)),
+                'price': round(self.random.uniform(0.5, 8), 2),
+                'qty': self.random.randint(1, 20),
+            }
+        else:
+            position = {
+                'symbol': symbol,
+                'type': 'STOCK',
+                'exp': '',
+                'strike': '',
+                'price': round(self.random.uniform(10, 500), 2),
+                'qty': self.random.choice([5, 10, 25, 50, 100, 200]),
+            }
+        position['side'] = self.random.choice(['BUY', 'SELL'])
+        return position
+
+    def executions(self):
+        """Yield executions in chronological order as (time, position, side, qty, effect, price)."""
+        now = self.start
+        open_positions = []
+        for _ in range(self.size):
+            now = self._next_time(now)
+            opening = not open_positions or (
+                len(open_positions) < self.MAX_OPEN_POSITIONS and self.random.random() < self.OPEN_PROBABILITY
+            )
+            if opening:
+                position = self._new_position()
+                position['remaining'] = position['qty']
+                open_positions.append(position)
+                yield now, position, position['side'], position['qty'], 'TO OPEN', position['price']
+                continue
+
+            position = self.random.choice(open_positions)
+            # Close everything or only part of what is left
+            qty = position['remaining'] if self.random.random() < 0.6 else self.random.randint(1, position['remaining'])
+            position['remaining'] -= qty
+            if not position['remaining']:
+                open_positions.remove(position)
+            side = 'SELL' if position['side'] == 'BUY' else 'BUY'
+            drift = self.random.uniform(-0.03, 0.03)
+            yield now, position, side, qty, 'TO CLOSE', round(max(position['price'] * (1 + drift), 0.01), 2)
+
+    @staticmethod
+    def _date(when):
+        return f"{when.month}/{when.day}/{when:%y}"
+
+    @staticmethod
+    def _description(position):
+        if position['type'] == 'STOCK':
+            return position['symbol']
+        return f"{position['symbol']} 100 {position['exp']} {position['strike']} {position['type']}"
+
+    def write(self, stream):
+        """Write the statement to a text stream."""
+        trade_rows = []
+        cash_rows = []
+        balance = 100000.0
+        first = last = self.start
+        for ref, (when, position, side, qty, effect, price) in enumerate(self.executions(), start=5140000000):
+            last = when
+            multiplier = 1 if position['type'] == 'STOCK' else 100
+            signed_qty = qty if side == 'BUY' else -qty
+            amount = -signed_qty * price * multiplier
+            commissions = -0.65 * qty if multiplier == 100 else 0.0
+            misc = -0.01 if side == 'SELL' else 0.0
+            balance += amount + commissions + misc
+            spread = 'STOCK' if position['type'] == 'STOCK' else 'SINGLE'
+            verb = 'BOT' if side == 'BUY' else 'SOLD'
+            cash_rows.append(
+                f"{self._date(when)},{when:%H:%M:%S},TRD,{ref},tIP {verb} {signed_qty:+d} "
+                f"{self._description(position)} @{price},{misc or ''},{commissions or ''},"
+                f"\"{amount:,.2f}\",\"{balance:,.2f}\"\n"
+            )
+            trade_rows.append(
+                f",{self._date(when)} {when:%H:%M:%S},{spread},{side},{signed_qty:+d},{effect},{position['symbol']},"
+                f"{position['exp']},{position['strike']},{position['type']},{price},{price},LMT\n"
+            )
+
+        stream.write(f"\ufeff{DISCLAIMER}\n\n")
+        stream.write(f"Account Statement for {self.account} (margin) since {self._date(first)} through {self._date(last)}\n\n")
+        stream.write("Cash Balance\nDATE,TIME,TYPE,REF #,DESCRIPTION,Misc Fees,Commissions & Fees,AMOUNT,BALANCE\n")
+        stream.writelines(cash_rows)
+        stream.write("\nFutures Statements\n"
+                     "Trade Date,Exec Date,Exec Time,Type,Ref #,Description,Misc Fees,Commissions & Fees,Amount,Balance\n\n")
+        stream.write(f" \n\"Total Cash ${balance:,.2f}\"\n\n\n")
+        stream.write("Account Trade History\n"
+                     ",Exec Time,Spread,Side,Qty,Pos Effect,Symbol,Exp,Strike,Type,Price,Net Price,Order Type\n")
+        stream.writelines(reversed(trade_rows))
+        stream.write("\nProfits and Losses\nSymbol,Description,P/L Open,P/L %,P/L Day,P/L YTD,P/L Diff,Mark Value\n")
+        stream.write(",OVERALL TOTALS,$0.00,0.00%,$0.00,$0.00,$0.00,$0.00\n\n")
+        stream.write(f"Account Summary\nNet Liquidating Value,\"${balance:,.2f}\"\n")
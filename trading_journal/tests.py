@@ -1,3 +1,1268 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest.mock import patch
 
-# Create your tests here.
+import numpy as np
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection, transaction
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.test import APITestCase
+
+from .management.commands import import_thinkorswim
+from .analytics import equity_curve, lttb, monte_carlo
+from .cache import bump_version, data_version
+from .checks import check_shared_cache
+from .matching import LotMatcher
+from .importers import import_statement, match_executions
+from .models import (
+    DailyPnL, ImportedStatement, ImportJob, JournalEntry, OpenLot, Tag, TagCategory, Trade, TradeRule
+)
+from .parsers import ThinkOrSwimParser
+from . import analytics, rolling
+from .rolling import RollingMetrics, rolling_metrics
+from .rollups import rebuild
+from .synthetic import StatementGenerator
+from .views import TradeViewSet
+from .worker import ImportWorker
+
+SAMPLE_STATEMENT = settings.BASE_DIR / 'brainn' / 'portt.csv'
+PARTIAL_FILLS_STATEMENT = settings.BASE_DIR / 'portyy.csv'
+# Keep test runs out of the project's shared cache directory
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': tempfile.mkdtemp(),
+    }
+}
+
+
+class ThinkOrSwimParserTests(SimpleTestCase):
+    def test_iter_executions_streams_trade_history(self):
+        with open(SAMPLE_STATEMENT, 'rb') as statement:
+            executions = list(ThinkOrSwimParser(statement, chunk_size=64).iter_executions())
+
+        self.assertEqual(len(executions), 4)
+        self.assertEqual(executions[0]['symbol'], 'GOOGL')
+        self.assertEqual(executions[0]['exec_time'], datetime(2025, 2, 26, 15, 4, 32))
+        self.assertEqual(executions[0]['strike'], '170')
+        self.assertEqual(executions[-1]['pos_effect'], 'TO OPEN')
+        self.assertEqual(executions[-1]['qty'], 50)
+
+    def test_parse_matches_string_and_stream_input(self):
+        with open(SAMPLE_STATEMENT, 'rb') as statement:
+            streamed = ThinkOrSwimParser(statement, chunk_size=7).parse()
+        content = SAMPLE_STATEMENT.read_text(encoding='utf-8-sig')
+
+        self.assertEqual(ThinkOrSwimParser(content).parse(), streamed)
+        self.assertEqual(
+            [(t['ticker_symbol'], round(t['profit_loss'], 2)) for t in streamed['trades']],
+            [('NLY', 0.98), ('GOOGL', 46.83)]
+        )
+
+    def test_missing_trade_history(self):
+        parser = ThinkOrSwimParser(io.BytesIO(b'Cash Balance\nDATE,TIME\n'))
+        self.assertEqual(parser.parse()['trades'], [])
+
+    def test_partial_closes_match_statement_pnl(self):
+        with open(PARTIAL_FILLS_STATEMENT, 'rb') as statement:
+            result = ThinkOrSwimParser(statement).parse()
+
+        self.assertEqual(len(result['trades']), 6)
+        self.assertEqual(result['open_lots'], [])
+        # Gross P&L matches the statement's own "P/L Diff" total, and every
+        # fee from the Cash Balance section ends up on a trade
+        fees = sum(t['fees'] for t in result['trades'])
+        self.assertAlmostEqual(fees, 13.22, places=6)
+        self.assertAlmostEqual(sum(t['profit_loss'] for t in result['trades']) + fees, 115.85, places=6)
+
+    def test_single_pass_indexes_sections(self):
+        with open(PARTIAL_FILLS_STATEMENT, 'rb') as statement:
+            parser = ThinkOrSwimParser(statement, chunk_size=50)
+            executions = parser.load_executions()
+            trade_history = parser.read_section(ThinkOrSwimParser.TRADE_HISTORY)
+
+        self.assertEqual(list(parser.sections), [
+            'Cash Balance', 'Futures Statements', 'Forex Statements', 'Account Order History',
+            'Account Trade History', 'Profits and Losses', 'Forex Account Summary', 'Account Summary'
+        ])
+        self.assertEqual(trade_history[0], ['Account Trade History'])
+        self.assertEqual(len(trade_history), 12)
+        # The fill's fees are split over its executions and no longer kept by the parser
+        fill = [e for e in executions if (e.exec_time, e.side, e.symbol) == (datetime(2025, 3, 4, 10, 38, 20), 'BUY', 'NOG')]
+        self.assertAlmostEqual(sum(e['fees'] for e in fill), 6.56, places=6)
+        self.assertEqual(parser.fees, {})
+        self.assertEqual(dict(fill[0])['symbol'], 'NOG')
+        self.assertEqual(parser.profits_and_losses[-1]['P/L Diff'], 115.85)
+        self.assertEqual(parser.account_summary['Net Liquidating Value'], 63300.02)
+
+
+def execution(minute, pos_effect, qty, price, side='BUY', symbol='AAA'):
+    return {
+        'exec_time': datetime(2025, 3, 3, 10, minute), 'spread': 'STOCK', 'side': side,
+        'qty': qty, 'pos_effect': pos_effect, 'symbol': symbol, 'exp': None,
+        'strike': None, 'type': 'STOCK', 'price': price,
+    }
+
+
+class LotMatcherTests(SimpleTestCase):
+    executions = [
+        execution(0, 'TO OPEN', 10, 10.0),
+        execution(1, 'TO OPEN', 10, 12.0),
+        execution(2, 'TO CLOSE', 15, 11.0, side='SELL'),
+        execution(3, 'TO CLOSE', 10, 13.0, side='SELL', symbol='BBB'),
+    ]
+
+    def test_fifo_splits_lots_across_closes(self):
+        result = LotMatcher('fifo').match(self.executions)
+
+        self.assertEqual([t['profit_loss'] for t in result['trades']], [10.0, -5.0])
+        self.assertEqual([(lot['price'], lot['qty']) for lot in result['open_lots']], [(12.0, 5.0)])
+
+    def test_lifo_consumes_latest_lot_first(self):
+        result = LotMatcher('lifo').match(self.executions)
+
+        self.assertEqual(sorted(t['profit_loss'] for t in result['trades']), [-10.0, 5.0])
+        self.assertEqual([(lot['price'], lot['qty']) for lot in result['open_lots']], [(10.0, 5.0)])
+
+    def test_close_never_matches_later_open(self):
+        result = LotMatcher().match([
+            execution(0, 'TO CLOSE', 5, 11.0, side='SELL'),
+            execution(1, 'TO OPEN', 5, 10.0),
+        ])
+
+        self.assertEqual(result['trades'], [])
+        self.assertEqual(len(result['open_lots']), 1)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), CACHES=TEST_CACHES)
+class ImportCsvTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('trader', password='secret')
+        self.client.force_authenticate(self.user)
+
+    def upload(self, path=SAMPLE_STATEMENT):
+        with open(path, 'rb') as statement:
+            upload = SimpleUploadedFile('statement.csv', statement.read(), content_type='text/csv')
+        return self.client.post('/api/trades/import_csv/', {'file': upload}, format='multipart')
+
+    def import_file(self, path=SAMPLE_STATEMENT):
+        response = self.upload(path)
+        self.assertEqual(response.status_code, 202)
+        ImportWorker().run_once()
+        return self.client.get(f"/api/import-jobs/{response.data['job_id']}/")
+
+    def test_import_runs_in_worker(self):
+        response = self.upload()
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'PENDING')
+        self.assertFalse(Trade.objects.exists())
+
+        path = ImportJob.objects.get(pk=response.data['job_id']).file.path
+        job = ImportWorker().run_once()
+        status = self.client.get(f"/api/import-jobs/{response.data['job_id']}/").data
+        self.assertEqual(job.pk, response.data['job_id'])
+        self.assertEqual(status['status'], 'COMPLETED')
+        self.assertEqual(status['rows_parsed'], 4)
+        self.assertEqual(status['trades_created'], 2)
+        self.assertIsNone(ImportWorker().run_once())
+        # The uploaded statement is removed once the job is done
+        self.assertFalse(job.file)
+        self.assertFalse(os.path.exists(path))
+
+    def test_heartbeat_is_kept_fresh_while_the_job_runs(self):
+        worker = ImportWorker()
+        worker.HEARTBEAT_EVERY = timedelta(milliseconds=10)
+        with patch.object(worker, 'beat') as beat:
+            with worker.heartbeat(ImportJob(pk=1)):
+                # Stands in for matching and saving, which report no progress
+                time.sleep(0.2)
+            beats = beat.call_count
+            time.sleep(0.05)
+        self.assertGreater(beats, 2)
+        self.assertEqual(beat.call_count, beats)
+
+    def test_reimport_skips_existing_trades(self):
+        self.import_file()
+        second = self.import_file().data
+
+        self.assertEqual(second['status'], 'COMPLETED')
+        self.assertTrue(second['duplicate_statement'])
+        self.assertEqual(second['trades_created'], 0)
+        self.assertEqual(Trade.objects.filter(user=self.user).count(), 2)
+
+    def test_stale_job_is_resumed(self):
+        response = self.upload()
+        ImportJob.objects.filter(pk=response.data['job_id']).update(
+            status='RUNNING', attempts=1, heartbeat_at=timezone.now() - timedelta(hours=1)
+        )
+
+        job = ImportWorker().run_once()
+        self.assertEqual(job.status, 'COMPLETED')
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(job.trades_created, 2)
+
+    def test_job_interrupted_too_often_fails_and_drops_its_file(self):
+        job = ImportJob.objects.get(pk=self.upload().data['job_id'])
+        ImportJob.objects.filter(pk=job.pk).update(
+            status='RUNNING', attempts=ImportWorker.MAX_ATTEMPTS, heartbeat_at=timezone.now() - timedelta(hours=1)
+        )
+
+        self.assertIsNone(ImportWorker().run_once())
+        failed = ImportJob.objects.get(pk=job.pk)
+        self.assertEqual(failed.status, 'FAILED')
+        self.assertFalse(failed.file)
+        self.assertFalse(os.path.exists(job.file.path))
+
+    def test_natural_key_is_unique_per_user(self):
+        self.import_file()
+        trade = Trade.objects.get(user=self.user, ticker_symbol='NLY')
+        trade.pk = None
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            trade.save()
+
+
+@override_settings(CACHES=TEST_CACHES)
+class StatisticsTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('trader')
+        self.client.force_authenticate(self.user)
+        breakout = Tag.objects.create(name='Breakout', created_by=self.user)
+        for day, (profit_loss, tagged) in enumerate([(50, True), (-20, True), (30, False), (-10, False)], start=1):
+            trade = Trade.objects.create(
+                user=self.user, ticker_symbol='AAA', trade_type='STOCK',
+                entry_date=timezone.make_aware(datetime(2025, 3, day, 10)),
+                exit_date=timezone.make_aware(datetime(2025, 3, day, 11)),
+                entry_price=10, exit_price=10, position_size=1, profit_loss=profit_loss,
+                is_win=profit_loss > 0
+            )
+            if tagged:
+                trade.tags.add(breakout)
+
+    def test_statistics_query_budget(self):
+        with self.assertNumQueries(2):
+            data = self.client.get('/api/trades/statistics/').data
+
+        self.assertEqual(data['total_trades'], 4)
+        self.assertEqual(data['total_profit'], 80.0)
+        self.assertEqual(data['total_loss'], 30.0)
+        self.assertEqual(data['average_loss'], -15.0)
+        self.assertEqual(data['strategy_performance'], [
+            {'name': 'Breakout', 'total_trades': 2, 'win_rate': 50.0, 'total_pnl': 30.0},
+            {'name': 'Untagged', 'total_trades': 2, 'win_rate': 50.0, 'total_pnl': 20.0},
+        ])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class AnalyticsCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('trader')
+        self.client.force_authenticate(self.user)
+        self.trade = Trade.objects.create(
+            user=self.user, ticker_symbol='AAA', trade_type='STOCK',
+            entry_date=timezone.make_aware(datetime(2025, 3, 3, 10)),
+            exit_date=timezone.make_aware(datetime(2025, 3, 3, 11)),
+            entry_price=10, exit_price=12, position_size=1
+        )
+        Trade.objects.create(
+            user=self.user, ticker_symbol='BBB', trade_type='STOCK',
+            entry_date=timezone.make_aware(datetime(2025, 3, 4, 10)),
+            exit_date=timezone.make_aware(datetime(2025, 3, 4, 11)),
+            entry_price=10, exit_price=9, position_size=1
+        )
+
+    def test_repeat_request_is_served_from_cache(self):
+        first = self.client.get('/api/trades/statistics/')
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/trades/statistics/')
+            not_modified = self.client.get('/api/trades/statistics/', HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_writes_invalidate_cache(self):
+        first = self.client.get('/api/trades/statistics/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.trade.tags.add(Tag.objects.create(name='Breakout', created_by=self.user))
+        tagged = self.client.get('/api/trades/statistics/', HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(tagged.status_code, 200)
+        self.assertEqual(tagged.data['strategy_performance'][0]['name'], 'Breakout')
+        self.assertNotEqual(tagged['ETag'], first['ETag'])
+
+    def test_version_moves_when_the_write_commits(self):
+        version = data_version(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.trade.notes = 'Changed'
+                self.trade.save()
+                self.assertEqual(data_version(self.user.pk), version)
+            self.assertEqual(data_version(self.user.pk), version)
+        self.assertNotEqual(data_version(self.user.pk), version)
+
+    def test_process_local_cache_is_flagged(self):
+        self.assertEqual(check_shared_cache(None), [])
+        local = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with override_settings(CACHES=local):
+            self.assertEqual([error.id for error in check_shared_cache(None)], ['trading_journal.W001'])
+
+    def test_equity_curve(self):
+        with self.assertNumQueries(1):
+            curve = self.client.get('/api/trades/equity_curve/').data
+
+        self.assertEqual(curve['times'], ['2025-03-03T11:00:00', '2025-03-04T11:00:00'])
+        self.assertEqual(curve['equity'], [2.0, 1.0])
+        self.assertEqual(curve['max_drawdown']['amount'], 1.0)
+
+    def test_monte_carlo(self):
+        params = {'simulations': 200, 'trades': 10, 'seed': 1, 'starting_equity': 100}
+        first = self.client.get('/api/trades/monte_carlo/', params).data
+        cache.clear()
+        self.assertEqual(self.client.get('/api/trades/monte_carlo/', params).data, first)
+        self.assertEqual(first['trades_per_path'], 10)
+        self.assertEqual(self.client.get('/api/trades/monte_carlo/', {'ruin': 2}).status_code, 400)
+        for params in [{'starting_equity': 'inf'}, {'starting_equity': 'nan'}, {'simulations': 100000, 'trades': 1000}]:
+            self.assertEqual(self.client.get('/api/trades/monte_carlo/', params).status_code, 400, params)
+        with patch.object(TradeViewSet, 'MONTE_CARLO_MAX_CELLS', 1000):
+            self.assertEqual(self.client.get('/api/trades/monte_carlo/', {'simulations': 1000}).data['trades_per_path'], 1)
+
+    def test_pnl_series(self):
+        daily = self.client.get('/api/trades/pnl_series/', {'bucket': 'day'}).data
+        self.assertEqual(daily['buckets'], ['2025-03-03T00:00:00+00:00', '2025-03-04T00:00:00+00:00'])
+        self.assertEqual((daily['trades'], daily['wins'], daily['net_pnl']), ([1, 1], [1, 0], [2.0, -1.0]))
+
+        hourly = self.client.get('/api/trades/pnl_series/', {'bucket': 'hour'}).data
+        self.assertEqual((hourly['buckets'], hourly['net_pnl']), ([11], [1.0]))
+        self.assertEqual(self.client.get('/api/trades/pnl_series/', {'bucket': 'year'}).status_code, 400)
+        for params in [{'points': 2}, {'points': -1}, {'start_date': '2025-13-01'}, {'end_date': 'yesterday'}]:
+            self.assertEqual(self.client.get('/api/trades/pnl_series/', params).status_code, 400, params)
+        ranged = self.client.get('/api/trades/pnl_series/', {'start_date': '2025-03-04', 'points': 3}).data
+        self.assertEqual(ranged['net_pnl'], [-1.0])
+
+
+class EquityCurveTests(SimpleTestCase):
+    def test_drawdown_streaks_and_ratios(self):
+        times = np.datetime64('2025-03-03T10:00') + np.arange(6) * np.timedelta64(1, 'h')
+        curve = equity_curve(times, [10, -4, -8, 5, 20, -1])
+
+        self.assertEqual(curve['equity'], [10, 6, -2, 3, 23, 22])
+        self.assertEqual(curve['drawdown'], [0, -4, -12, -7, 0, -1])
+        self.assertEqual(curve['max_drawdown'], {
+            'amount': 12.0, 'peak_index': 0, 'trough_index': 2, 'trades': 4, 'seconds': 4 * 3600
+        })
+        self.assertEqual(curve['expectancy'], round(22 / 6, 2))
+        self.assertEqual((curve['longest_win_streak'], curve['longest_loss_streak']), (2, 2))
+        self.assertGreater(curve['sortino'], curve['sharpe'])
+
+    def test_lttb_keeps_extremes_and_budget(self):
+        x = np.arange(1000)
+        y = np.sin(x / 50)
+        kept = lttb(x, y, 50)
+
+        self.assertEqual(len(kept), 50)
+        self.assertEqual((kept[0], kept[-1]), (0, 999))
+        self.assertTrue(np.all(np.diff(kept) > 0))
+        self.assertGreater(y[kept].max(), 0.99)
+        self.assertEqual(len(lttb(x[:10], y[:10], 50)), 10)
+
+    def test_monte_carlo_is_reproducible_across_chunks_and_processes(self):
+        pnl = [50, -20, 30, -40, 10]
+        # Start without a pool so that building the shared one is counted
+        with patch('trading_journal.analytics._pool', None), \
+                patch('trading_journal.analytics.MONTE_CARLO_CHUNK_CELLS', 2000), \
+                patch('trading_journal.analytics.MONTE_CARLO_POOL_CELLS', 1), \
+                patch('trading_journal.analytics.ProcessPoolExecutor', wraps=ProcessPoolExecutor) as executor:
+            pooled = monte_carlo(pnl, simulations=500, trades=100, seed=42)
+            self.assertEqual(monte_carlo(pnl, simulations=500, trades=100, seed=42), pooled)
+            analytics._pool.shutdown()
+        # Both runs share one pool
+        self.assertEqual(executor.call_count, 1)
+        with patch('trading_journal.analytics.MONTE_CARLO_CHUNK_CELLS', 2000):
+            inline = monte_carlo(pnl, simulations=500, trades=100, seed=42)
+
+        self.assertEqual(pooled, inline)
+        self.assertNotEqual(monte_carlo(pnl, simulations=500, trades=100, seed=7), inline)
+        self.assertLessEqual(inline['ending_equity']['p5'], inline['ending_equity']['p95'])
+        self.assertTrue(0 <= inline['probability_of_ruin'] <= 1)
+
+    def test_no_trades(self):
+        curve = equity_curve([], [])
+        self.assertEqual((curve['equity'], curve['sharpe']), ([], None))
+
+
+class RollingMetricsTests(SimpleTestCase):
+    times = [0, 3600, 86400, 2 * 86400, 5 * 86400, 5 * 86400 + 60]
+    pnl = [10, -5, 20, -10, 0, 30]
+
+    def brute_force(self, window, unit):
+        rows = []
+        for i, now in enumerate(self.times):
+            if unit == 'days':
+                sample = [p for t, p in zip(self.times, self.pnl) if now - window * 86400 < t <= now]
+            else:
+                sample = self.pnl[max(0, i + 1 - window):i + 1]
+            losses = -sum(p for p in sample if p < 0)
+            rows.append((
+                sum(p > 0 for p in sample) / len(sample) * 100,
+                sum(sample) / len(sample),
+                sum(p for p in sample if p > 0) / losses if losses else None,
+            ))
+        return rows
+
+    def test_matches_brute_force(self):
+        metrics = RollingMetrics(self.times, self.pnl)
+        for window, unit in [(1, 'trades'), (3, 'trades'), (10, 'trades'), (1, 'days'), (3, 'days')]:
+            series = metrics.series(window, unit)
+            profit_factor = [None if np.isnan(v) else v for v in series['profit_factor']]
+            self.assertEqual(
+                list(zip(series['win_rate'], series['expectancy'], profit_factor)),
+                self.brute_force(window, unit)
+            )
+
+    def test_append_in_close_order_only(self):
+        metrics = RollingMetrics(self.times[:-1], self.pnl[:-1])
+        self.assertTrue(metrics.append(self.times[-1], self.pnl[-1]))
+        self.assertFalse(metrics.append(0, 5))
+        self.assertEqual(metrics.sums, RollingMetrics(self.times, self.pnl).sums)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RollingEndpointTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('trader')
+        self.client.force_authenticate(self.user)
+
+    def create_trade(self, day, exit_price):
+        return self.client.post('/api/trades/', {
+            'ticker_symbol': 'AAA', 'trade_type': 'STOCK', 'position_size': 1,
+            'entry_date': f'2025-03-{day:02d}T10:00:00Z', 'exit_date': f'2025-03-{day:02d}T11:00:00Z',
+            'entry_price': 10, 'exit_price': exit_price
+        })
+
+    def test_new_trade_extends_cached_metrics(self):
+        self.create_trade(3, 12)
+        self.create_trade(4, 9)
+        self.assertEqual(self.client.get('/api/trades/rolling/', {'window': 2}).data['win_rate'], [100.0, 50.0])
+
+        version = data_version(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.create_trade(5, 11).status_code, 201)
+        # The write only queues the trade; the prefix sums are left alone
+        self.assertEqual(cache.get(rolling._state_key(self.user.pk))['version'], version)
+        self.assertEqual(len(cache.get(rolling._tail_key(self.user.pk))['trades']), 1)
+        with self.assertNumQueries(0):
+            metrics = rolling_metrics(self.user.pk)
+        self.assertEqual(len(metrics), 3)
+        self.assertEqual(cache.get(rolling._tail_key(self.user.pk))['trades'], [])
+
+        data = self.client.get('/api/trades/rolling/', {'window': 2}).data
+        self.assertEqual(data['win_rate'], [100.0, 50.0, 50.0])
+        self.assertEqual(data['profit_factor'], [None, 2.0, 1.0])
+
+    def test_tail_is_stamped_with_the_writes_own_version(self):
+        self.create_trade(3, 12)
+        rolling_metrics(self.user.pk)
+        previous_version = data_version(self.user.pk)
+        trade = Trade.objects.get(user=self.user)
+
+        # Another write bumps the version before this one's tail is appended
+        with self.captureOnCommitCallbacks(execute=True):
+            version = bump_version(self.user.pk)
+            bump_version(self.user.pk)
+        self.assertTrue(rolling._append_trades(self.user.pk, [trade], previous_version, version))
+
+        self.assertEqual(cache.get(rolling._tail_key(self.user.pk))['version'], version)
+        self.assertNotEqual(data_version(self.user.pk), version)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(rolling_metrics(self.user.pk)), 1)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TradeNaturalKeyTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('trader')
+        self.client.force_authenticate(self.user)
+        self.trade = {
+            'ticker_symbol': 'AAA', 'trade_type': 'STOCK', 'position_size': 1, 'entry_price': 10,
+            'entry_date': '2025-03-03T10:00:00Z', 'exit_date': '2025-03-03T11:00:00Z', 'exit_price': 12
+        }
+
+    def test_repeated_natural_key_is_a_validation_error(self):
+        created = self.client.post('/api/trades/', self.trade)
+        self.assertEqual(created.status_code, 201)
+
+        response = self.client.post('/api/trades/', self.trade)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('non_field_errors', response.data)
+        self.assertEqual(self.client.post('/api/trades/', dict(self.trade, contract='CALL 10 21 MAR 25')).status_code, 201)
+        # Open trades never collide, and a trade can be saved over itself
+        self.assertEqual(self.client.post('/api/trades/', dict(self.trade, exit_date='', exit_price='')).status_code, 201)
+        self.assertEqual(self.client.post('/api/trades/', dict(self.trade, exit_date='', exit_price='')).status_code, 201)
+        url = f"/api/trades/{created.data['trade_id']}/"
+        self.assertEqual(self.client.put(url, dict(self.trade, notes='Edited')).status_code, 200)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class DailyPnLTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('trader')
+
+    def trade(self, day, profit_loss, **fields):
+        return Trade.objects.create(
+            user=self.user, ticker_symbol='AAA', trade_type='STOCK',
+            entry_date=timezone.make_aware(datetime(2025, 3, day, 10, Trade.objects.count())),
+            exit_date=timezone.make_aware(datetime(2025, 3, day, 11)),
+            entry_price=10, exit_price=10, position_size=1, profit_loss=profit_loss, **fields
+        )
+
+    def rollup(self):
+        return list(DailyPnL.objects.filter(user=self.user).values_list(
+            'date', 'trade_count', 'wins', 'losses', 'gross_profit', 'gross_loss', 'net_pnl', 'fees'
+        ))
+
+    def test_signals_keep_rollup_in_step(self):
+        first = self.trade(3, 50, fees=1)
+        self.trade(3, -20)
+        moved = self.trade(4, 10, notes='moved')
+        self.assertEqual(self.rollup(), [
+            (date(2025, 3, 3), 2, 1, 1, 50, 20, 30, 1),
+            (date(2025, 3, 4), 1, 1, 0, 10, 0, 10, 0),
+        ])
+
+        first.profit_loss = -5
+        first.save()
+        moved.entry_date = timezone.make_aware(datetime(2025, 3, 3, 12))
+        moved.save()
+        Trade.objects.filter(profit_loss=-20).delete()
+        expected = [(date(2025, 3, 3), 2, 1, 1, 10, 5, 5, 1)]
+        self.assertEqual(self.rollup(), expected)
+
+        call_command('rebuild_daily_pnl', stdout=io.StringIO())
+        self.assertEqual(self.rollup(), expected)
+
+    def test_string_entry_date(self):
+        Trade.objects.create(
+            user=self.user, ticker_symbol='AAA', trade_type='STOCK', entry_date='2025-03-03T10:00:00Z',
+            exit_date='2025-03-03T11:00:00Z', entry_price=10, exit_price=10, position_size=1, profit_loss=5
+        )
+        self.assertEqual(self.rollup(), [(date(2025, 3, 3), 1, 1, 0, 5, 0, 5, 0)])
+
+    def test_import_updates_rollup(self):
+        import_statement(self.user, PARTIAL_FILLS_STATEMENT.read_text(encoding='utf-8-sig'))
+
+        rollup = DailyPnL.objects.filter(user=self.user)
+        self.assertEqual(sum(day.trade_count for day in rollup), Trade.objects.filter(user=self.user).count())
+        self.assertEqual(sum(day.net_pnl for day in rollup), sum(t.profit_loss for t in Trade.objects.all()))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class PivotTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('trader')
+        self.client.force_authenticate(self.user)
+        setups = TagCategory.objects.create(name='Setups', color='blue', created_by=self.user)
+        breakout = Tag.objects.create(name='Breakout', created_by=self.user, category=setups)
+        trades = [
+            ('AAA', 'STOCK', 3, timedelta(minutes=2), 30, True),
+            ('AAA', 'OPTION', 3, timedelta(hours=3), -10, True),
+            ('BBB', 'STOCK', 4, timedelta(days=2), 20, False),
+        ]
+        for symbol, trade_type, day, held, profit_loss, tagged in trades:
+            entry_date = timezone.make_aware(datetime(2025, 3, day, 10))
+            trade = Trade.objects.create(
+                user=self.user, ticker_symbol=symbol, trade_type=trade_type,
+                entry_date=entry_date, exit_date=entry_date + held,
+                entry_price=10, exit_price=10, position_size=1, profit_loss=profit_loss,
+                is_win=profit_loss > 0
+            )
+            if tagged:
+                trade.tags.add(breakout)
+
+    def pivot(self, dimensions):
+        return self.client.get('/api/trades/pivot/', {'dimensions': dimensions}).data['cells']
+
+    def test_single_grouped_query(self):
+        with self.assertNumQueries(1):
+            cells = self.pivot('tag_category,ticker_symbol,weekday')
+
+        self.assertEqual(cells, [
+            {'tag_category': 'Setups', 'ticker_symbol': 'AAA', 'weekday': 1,
+             'total_trades': 2, 'win_rate': 50.0, 'total_pnl': 20.0},
+            {'tag_category': 'Uncategorized', 'ticker_symbol': 'BBB', 'weekday': 2,
+             'total_trades': 1, 'win_rate': 100.0, 'total_pnl': 20.0},
+        ])
+
+    def test_holding_time_buckets(self):
+        cells = self.pivot('holding_time')
+        self.assertEqual(
+            {cell['holding_time']: cell['total_pnl'] for cell in cells},
+            {'Under 5 minutes': 30.0, '1 hour to 1 day': -10.0, '1 day to 1 week': 20.0}
+        )
+
+    def test_renamed_category_is_not_served_from_cache(self):
+        self.assertEqual([cell['tag_category'] for cell in self.pivot('tag_category')], ['Setups', 'Uncategorized'])
+        category = TagCategory.objects.get(created_by=self.user)
+        category.name = 'Breakouts'
+        with self.captureOnCommitCallbacks(execute=True):
+            category.save()
+        self.assertEqual([cell['tag_category'] for cell in self.pivot('tag_category')], ['Breakouts', 'Uncategorized'])
+
+    def test_rejects_unknown_or_too_many_dimensions(self):
+        for dimensions in ['strategy', 'tag,hour,weekday,trade_type']:
+            response = self.client.get('/api/trades/pivot/', {'dimensions': dimensions})
+            self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class HistogramTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('trader')
+        self.client.force_authenticate(self.user)
+        for minute, profit_loss in enumerate([-30, -10, -10, 0, 5, 5, 10, 20, 40, 90]):
+            entry_date = timezone.make_aware(datetime(2025, 3, 3, 10, minute))
+            Trade.objects.create(
+                user=self.user, ticker_symbol='AAA', trade_type='STOCK',
+                entry_date=entry_date, exit_date=entry_date + timedelta(minutes=minute),
+                entry_price=10, exit_price=10, position_size=minute + 1, profit_loss=profit_loss,
+                is_win=profit_loss > 0
+            )
+
+    def histogram(self, **params):
+        return self.client.get('/api/trades/histogram/', params).data
+
+    def test_fixed_bins(self):
+        with self.assertNumQueries(3):
+            data = self.histogram(bins=4)
+
+        self.assertEqual(data['edges'], [-30.0, 0.0, 30.0, 60.0, 90.0])
+        self.assertEqual(data['counts'], [3, 5, 1, 1])
+        self.assertEqual(data['percentiles'], {'p5': -30.0, 'p50': 5.0, 'p95': 90.0})
+        self.assertEqual(data['mean'], 12.0)
+
+    def test_quantile_bins(self):
+        with self.assertNumQueries(2):
+            data = self.histogram(bins=4, mode='quantile')
+
+        self.assertEqual(data['edges'], [-30.0, -10.0, 5.0, 20.0, 90.0])
+        self.assertEqual(data['counts'], [2, 3, 2, 3])
+
+    def test_holding_time_and_position_size(self):
+        holding = self.histogram(field='holding_time', bins=3)
+        self.assertEqual((holding['min'], holding['max']), (0.0, 540.0))
+        self.assertEqual(sum(holding['counts']), 10)
+        self.assertEqual(self.histogram(field='position_size', bins=1)['counts'], [10])
+        self.assertEqual(self.client.get('/api/trades/histogram/', {'bins': 0}).status_code, 400)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class PeriodSummaryTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('trader')
+        self.client.force_authenticate(self.user)
+        for day, profit_loss in [(3, 50), (4, -20), (5, 80), (10, -5), (11, 15)]:
+            Trade.objects.create(
+                user=self.user, ticker_symbol=f'T{day}', trade_type='STOCK',
+                entry_date=timezone.make_aware(datetime(2025, 3, day, 10)),
+                exit_date=timezone.make_aware(datetime(2025, 3, day, 11)),
+                entry_price=10, exit_price=10, position_size=1, profit_loss=profit_loss,
+                is_win=profit_loss > 0
+            )
+
+    def test_every_week_in_two_queries(self):
+        params = {'start_date': '2025-03-01', 'end_date': '2025-03-31', 'period': 'week'}
+        with self.assertNumQueries(2):
+            periods = self.client.get('/api/trades/period_summary/', params).data['periods']
+
+        self.assertEqual([p['period_start'] for p in periods], [date(2025, 3, 3), date(2025, 3, 10)])
+        self.assertEqual([p['total_trades'] for p in periods], [3, 2])
+        self.assertEqual([p['total_pnl'] for p in periods], [110.0, 10.0])
+        self.assertEqual([p['best_trade']['symbol'] for p in periods], ['T5', 'T11'])
+
+        # Each period matches what weekly_summary reports for the same window
+        week = self.client.get('/api/trades/weekly_summary/', {'start_date': '2025-03-03', 'end_date': '2025-03-09'}).data
+        self.assertEqual({key: periods[0][key] for key in week}, week)
+
+    def test_malformed_dates_are_rejected(self):
+        for start_date, end_date in [('2025-03-01', '2025-02-30'), ('March', '2025-03-31'), ('', '2025-03-31')]:
+            response = self.client.get('/api/trades/period_summary/', {'start_date': start_date, 'end_date': end_date})
+            self.assertEqual(response.status_code, 400)
+
+    def test_open_trades_are_counted(self):
+        for day in (5, 12):
+            Trade.objects.create(
+                user=self.user, ticker_symbol=f'OPEN{day}', trade_type='STOCK',
+                entry_date=timezone.make_aware(datetime(2025, 3, day, 12)), entry_price=10, position_size=1
+            )
+        params = {'start_date': '2025-03-01', 'end_date': '2025-03-31', 'period': 'week'}
+        periods = self.client.get('/api/trades/period_summary/', params).data['periods']
+        self.assertEqual([p['total_trades'] for p in periods], [4, 3])
+        self.assertEqual([p['best_trade']['symbol'] for p in periods], ['T5', 'T11'])
+
+        for start_date, end_date, period in [('2025-03-03', '2025-03-09', periods[0]), ('2025-03-10', '2025-03-16', periods[1])]:
+            week = self.client.get('/api/trades/weekly_summary/', {'start_date': start_date, 'end_date': end_date}).data
+            self.assertEqual({key: period[key] for key in week}, week)
+        self.assertEqual(periods[0]['win_rate'], 50.0)
+
+        # A week with nothing but an open trade
+        periods = self.client.get('/api/trades/period_summary/', dict(params, start_date='2025-03-12')).data['periods']
+        self.assertEqual(periods[0]['total_trades'], 1)
+        self.assertIsNone(periods[0]['best_trade'])
+        week = self.client.get('/api/trades/weekly_summary/', {'start_date': '2025-03-12', 'end_date': '2025-03-12'}).data
+        self.assertEqual(week, {key: periods[0][key] for key in week})
+
+
+class RelatedRowsMixin:
+    """Trades and journal entries that each carry a tag with a category, and trades a rule."""
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('trader')
+        self.client.force_authenticate(self.user)
+        self.day = 0
+
+    def add_rows(self, count):
+        for _ in range(count):
+            self.day += 1
+            category = TagCategory.objects.create(name=f'Category {self.day}', color='blue', created_by=self.user)
+            tag = Tag.objects.create(name=f'Tag {self.day}', created_by=self.user, category=category)
+            rule = TradeRule.objects.create(user=self.user, title='Rule', content='', category='GENERAL')
+            self.trade = Trade.objects.create(
+                user=self.user, ticker_symbol='AAA', trade_type='STOCK',
+                entry_date=timezone.make_aware(datetime(2025, 1, 1)) + timedelta(days=self.day),
+                entry_price=10, exit_price=11, position_size=1
+            )
+            self.trade.tags.add(tag)
+            self.trade.rules_followed.add(rule)
+            self.entry = JournalEntry.objects.create(
+                user=self.user, type='journal', title='Entry', content='', mood='Neutral'
+            )
+            self.entry.tags.add(tag)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class QueryBudgetTests(RelatedRowsMixin, APITestCase):
+    """Pins the number of queries each endpoint makes, however many rows it returns.
+
+    Every endpoint is requested once, then again after more related rows are
+    added; an N+1 shows up as the second request costing more queries.
+    """
+    BUDGETS = {
+        # Validators (with the count), page, tags with categories, rules
+        '/api/trades/': 4,
+        '/api/trades/{trade}/': 4,
+        # Validators, rows, tag links, tags, rule links
+        '/api/trades/?fields=trade_id,tags,rules_followed&expand=tags': 5,
+        '/api/journal/': 3,
+        '/api/journal/{entry}/': 3,
+        '/api/tags/': 2,
+        '/api/rules/': 2,
+    }
+
+    def assertQueryBudget(self, url, budget):
+        with self.assertNumQueries(budget, msg=url):
+            response = self.client.get(url.format(trade=self.trade.pk, entry=self.entry.pk))
+        self.assertEqual(response.status_code, 200, url)
+
+    def test_endpoints_stay_within_budget(self):
+        for rows in (1, 5):
+            self.add_rows(rows)
+            for url, budget in self.BUDGETS.items():
+                with self.subTest(url=url, rows=self.day):
+                    self.assertQueryBudget(url, budget)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ConditionalGetTests(RelatedRowsMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_rows(3)
+
+    def etag(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_unchanged_rows_get_304_without_serializing(self):
+        for url in ['/api/trades/', f'/api/trades/{self.trade.pk}/', '/api/journal/',
+                    f'/api/journal/{self.entry.pk}/', '/api/rules/']:
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                with self.assertNumQueries(1):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], first['ETag'])
+
+                # Once the rows' second has passed, Last-Modified validates too
+                with patch('trading_journal.views.time') as clock:
+                    clock.time.return_value = time.time() + 2
+                    first = self.client.get(url)
+                    response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+                self.assertEqual(response.status_code, 304)
+
+    def test_rows_changed_this_second_are_validated_by_etag_only(self):
+        first = self.client.get('/api/trades/')
+        self.assertIn('ETag', first)
+        self.assertNotIn('Last-Modified', first)
+
+        # A same-second write would not move an If-Modified-Since date
+        response = self.client.get('/api/trades/', HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+        self.assertEqual(response.status_code, 200)
+
+    def test_validators_follow_the_rows(self):
+        etag = self.etag('/api/trades/')
+        self.assertNotEqual(self.etag('/api/trades/', page_size=2), etag)
+        self.assertNotEqual(self.etag('/api/trades/', ticker_symbol='BBB'), etag)
+
+        self.client.patch(f'/api/trades/{self.trade.pk}/', {'notes': 'Changed'}, format='json')
+        self.assertNotEqual(self.etag('/api/trades/'), etag)
+
+        etag = self.etag('/api/trades/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.trade.tags.first().save()
+        self.assertNotEqual(self.etag('/api/trades/'), etag)
+
+        etag = self.etag('/api/journal/')
+        category = self.entry.tags.first().category
+        category.name = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            category.save()
+        self.assertNotEqual(self.etag('/api/journal/'), etag)
+
+        etag = self.etag('/api/journal/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.entry.delete()
+        self.assertNotEqual(self.etag('/api/journal/'), etag)
+
+    def test_missing_rows_are_not_validated(self):
+        response = self.client.get('/api/trades/999999/')
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('ETag', response)
+        self.assertEqual(self.client.get('/api/trades/nope/').status_code, 404)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SparseFieldsTests(RelatedRowsMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_rows(3)
+
+    def test_values_rows_match_full_serializer(self):
+        full = {trade['trade_id']: trade for trade in self.client.get('/api/trades/').data['results']}
+        fields = 'trade_id,ticker_symbol,entry_date,exit_price,profit_loss,user,tags,rules_followed'
+        with self.assertNumQueries(5):  # count, rows, tag links, tags with categories, rule links
+            sparse = self.client.get('/api/trades/', {'fields': fields, 'expand': 'tags'}).data['results']
+
+        for trade in sparse:
+            self.assertEqual(list(trade), fields.split(','))
+            expected = full[trade['trade_id']]
+            self.assertEqual(trade['tags'], expected['tags'])
+            self.assertEqual(trade['rules_followed'], [rule['id'] for rule in expected['rules_followed']])
+            for name in fields.split(',')[:-2]:
+                self.assertEqual(trade[name], expected[name])
+
+    def test_cursor_pages_and_detail_with_fields(self):
+        first = self.client.get('/api/journal/', {'fields': 'title,tags', 'cursor': '', 'page_size': 2}).data
+        self.assertEqual(first['results'][0], {'title': 'Entry', 'tags': [self.entry.tags.get().pk]})
+        self.assertEqual(len(self.client.get(first['next']).data['results']), 1)
+
+        detail = self.client.get(f'/api/trades/{self.trade.pk}/', {'fields': 'ticker_symbol,tags'}).data
+        self.assertEqual(detail, {'ticker_symbol': 'AAA', 'tags': [self.trade.tags.get().pk]})
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ExportTests(RelatedRowsMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_rows(5)
+
+    def test_csv_streams_filtered_trades_with_tags(self):
+        Trade.objects.filter(pk=self.trade.pk).update(
+            notes='Line one, "quoted"\nline two', contract='CALL 150 21 MAR 25'
+        )
+        with patch.object(TradeViewSet, 'EXPORT_CHUNK_SIZE', 2), self.assertNumQueries(4):
+            response = self.client.get('/api/trades/export/', {'ordering': 'entry_date'})
+            content = b''.join(response.streaming_content).decode()
+
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual([row['tags'] for row in rows], [f'Tag {day}' for day in range(1, 6)])
+        self.assertEqual(rows[-1]['notes'], 'Line one, "quoted"\nline two')
+        self.assertEqual([rows[0]['contract'], rows[-1]['contract']], ['', 'CALL 150 21 MAR 25'])
+        self.assertEqual(rows[0]['entry_date'], '2025-01-02T00:00:00+00:00')
+
+    def test_ndjson(self):
+        response = self.client.get('/api/trades/export/', {'output': 'ndjson', 'ticker_symbol': 'AAA'})
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(lines[0]['entry_price'], '10.00')
+        self.assertEqual(lines[0]['tags'], ['Tag 5'])
+        self.assertEqual(self.client.get('/api/trades/export/', {'output': 'xml'}).status_code, 400)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class BulkWriteTests(RelatedRowsMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.tag = Tag.objects.create(name='Breakout', created_by=self.user)
+
+    def assertRollupCurrent(self):
+        stored = list(DailyPnL.objects.filter(user=self.user).order_by('date').values())
+        rebuild([self.user])
+        rebuilt = list(DailyPnL.objects.filter(user=self.user).order_by('date').values())
+        self.assertEqual([dict(row, id=None) for row in stored], [dict(row, id=None) for row in rebuilt])
+
+    def test_create_reports_each_item(self):
+        trade = {
+            'ticker_symbol': 'BBB', 'trade_type': 'STOCK', 'entry_date': '2025-02-03T10:00:00Z',
+            'exit_date': '2025-02-06T10:00:00Z', 'entry_price': '10.00', 'exit_price': '12.50',
+            'position_size': '2', 'fees': '1.00'
+        }
+        other = Tag.objects.create(name='Not mine', created_by=User.objects.create_user('other'))
+        response = self.client.post('/api/trades/bulk/', [
+            dict(trade, tag_ids=[self.tag.pk]),
+            dict(trade, entry_date='2025-02-04T10:00:00Z'),
+            dict(trade),
+            dict(trade, entry_price='oops'),
+            dict(trade, entry_date='2025-02-05T10:00:00Z', tag_ids=[other.pk]),
+        ], format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['succeeded'], response.data['failed']), (2, 3))
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results], ['created', 'created', 'error', 'error', 'error'])
+        self.assertIn('entry_price', results[3]['errors'])
+        self.assertIn('tag_ids', results[4]['errors'])
+        created = Trade.objects.get(pk=results[0]['trade_id'])
+        self.assertEqual(created.profit_loss, Decimal('4.00'))
+        self.assertTrue(created.is_win)
+        self.assertEqual(list(created.tags.all()), [self.tag])
+        self.assertEqual(DailyPnL.objects.get(user=self.user, date=date(2025, 2, 3)).net_pnl, Decimal('4.00'))
+        self.assertRollupCurrent()
+
+    def test_open_trades_with_the_same_entry_are_all_created(self):
+        trade = {
+            'ticker_symbol': 'BBB', 'trade_type': 'STOCK', 'entry_date': '2025-02-03T10:00:00Z',
+            'entry_price': '10.00', 'position_size': '2'
+        }
+        response = self.client.post('/api/trades/bulk/', [trade, trade], format='json')
+
+        self.assertEqual((response.data['succeeded'], response.data['failed']), (2, 0))
+        self.assertEqual(Trade.objects.filter(user=self.user, ticker_symbol='BBB', exit_date=None).count(), 2)
+
+    def test_retagging_costs_the_same_queries_for_any_batch(self):
+        self.add_rows(6)
+        trade_ids = list(Trade.objects.filter(user=self.user).values_list('pk', flat=True))
+
+        def retag(ids, **changes):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.patch(
+                    '/api/trades/bulk/', [dict(changes, trade_id=pk) for pk in ids], format='json'
+                )
+            self.assertEqual(response.data['failed'], 0)
+            return len(queries)
+
+        self.assertEqual(retag(trade_ids[:1], add_tag_ids=[self.tag.pk]), retag(trade_ids, add_tag_ids=[self.tag.pk]))
+        self.assertEqual(Trade.tags.through.objects.filter(tag=self.tag).count(), 6)
+
+        retag(trade_ids[:2], remove_tag_ids=[self.tag.pk], notes='Reviewed')
+        self.assertEqual(Trade.tags.through.objects.filter(tag=self.tag).count(), 4)
+        self.assertEqual(Trade.objects.filter(notes='Reviewed').count(), 2)
+
+        retag(trade_ids[:1], tag_ids=[], rule_ids=[])
+        self.assertFalse(Trade.objects.get(pk=trade_ids[0]).tags.exists())
+        self.assertFalse(Trade.objects.get(pk=trade_ids[0]).rules_followed.exists())
+
+    def test_update_moves_rollup_and_rejects_unknown_trades(self):
+        self.add_rows(2)
+        first, second = Trade.objects.filter(user=self.user).order_by('entry_date')
+        response = self.client.patch('/api/trades/bulk/', [
+            {'trade_id': first.pk, 'entry_date': '2025-03-01T10:00:00Z'},
+            {'trade_id': 999999},
+            {'trade_id': second.pk, 'execution_rating': 9},
+        ], format='json')
+
+        self.assertEqual([result['status'] for result in response.data['results']], ['updated', 'error', 'error'])
+        self.assertEqual(response.data['results'][1]['errors'], {'trade_id': ['Not found.']})
+        first.refresh_from_db()
+        self.assertGreater(first.updated_at, second.updated_at)
+        self.assertTrue(DailyPnL.objects.filter(user=self.user, date=date(2025, 3, 1)).exists())
+        self.assertRollupCurrent()
+
+    def test_update_reports_natural_key_collisions_per_item(self):
+        a, b, c = [
+            Trade.objects.create(
+                user=self.user, ticker_symbol='AAA', trade_type='STOCK', entry_price=10, exit_price=11, position_size=1,
+                entry_date=timezone.make_aware(datetime(2025, 3, day, 10)),
+                exit_date=timezone.make_aware(datetime(2025, 3, day, 11))
+            )
+            for day in (3, 4, 5)
+        ]
+        response = self.client.patch('/api/trades/bulk/', [
+            {'trade_id': a.pk, 'entry_date': b.entry_date.isoformat(), 'exit_date': b.exit_date.isoformat()},
+            {'trade_id': c.pk, 'ticker_symbol': 'ZZZ'},
+            {'trade_id': b.pk, 'ticker_symbol': 'ZZZ', 'entry_date': c.entry_date.isoformat(),
+             'exit_date': c.exit_date.isoformat()},
+            {'trade_id': a.pk, 'notes': 'Kept'},
+        ], format='json')
+
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results], ['error', 'updated', 'error', 'updated'])
+        self.assertIn('non_field_errors', results[0]['errors'])
+        self.assertEqual(results[2]['trade_id'], b.pk)
+        self.assertEqual(
+            list(Trade.objects.filter(user=self.user).order_by('entry_date').values_list('ticker_symbol', 'notes')),
+            [('AAA', 'Kept'), ('AAA', ''), ('ZZZ', '')]
+        )
+        self.assertRollupCurrent()
+
+    def test_delete(self):
+        self.add_rows(3)
+        trade_ids = list(Trade.objects.filter(user=self.user).values_list('pk', flat=True))
+        response = self.client.delete('/api/trades/bulk/', trade_ids[:2] + [999999], format='json')
+
+        self.assertEqual((response.data['succeeded'], response.data['failed']), (2, 1))
+        self.assertEqual(list(Trade.objects.filter(user=self.user).values_list('pk', flat=True)), trade_ids[2:])
+        self.assertEqual(DailyPnL.objects.filter(user=self.user).count(), 1)
+        self.assertRollupCurrent()
+        self.assertEqual(self.client.delete('/api/trades/bulk/', {'ids': trade_ids}, format='json').status_code, 400)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('trader')
+        self.client.force_authenticate(self.user)
+        # Pairs of trades share an entry date, and every third trade is still open
+        for i in range(7):
+            entry_date = timezone.make_aware(datetime(2025, 3, 1 + i // 2, 10))
+            Trade.objects.create(
+                user=self.user, ticker_symbol=f'T{i}', trade_type='STOCK', entry_date=entry_date,
+                exit_date=None if i % 3 == 0 else entry_date + timedelta(hours=i),
+                entry_price=10, exit_price=11, position_size=1
+            )
+
+    def walk(self, **params):
+        symbols = []
+        response = self.client.get('/api/trades/', {'cursor': '', 'page_size': 2, **params})
+        while True:
+            symbols += [trade['ticker_symbol'] for trade in response.data['results']]
+            if not response.data['next']:
+                return symbols, response.data
+            response = self.client.get(response.data['next'])
+
+    def test_cursor_pages_follow_ordering_with_pk_tiebreaker(self):
+        trades = Trade.objects.filter(user=self.user)
+        for ordering in ['-entry_date', 'entry_date', 'exit_date', '-exit_date']:
+            with self.subTest(ordering=ordering):
+                symbols, _ = self.walk(ordering=ordering)
+                self.assertEqual(len(symbols), 7)
+                self.assertEqual(len(set(symbols)), 7)
+                values = [getattr(trades.get(ticker_symbol=s), ordering.lstrip('-')) for s in symbols]
+                present = [v for v in values if v is not None]
+                self.assertEqual(present, sorted(present, reverse=ordering.startswith('-')))
+                self.assertEqual(values[len(present):], [None] * (7 - len(present)))
+
+    def test_count_opt_out(self):
+        # The validators' aggregate, one page query and the tag and rule prefetches
+        with self.assertNumQueries(4):
+            _, last = self.walk(count='false', page_size=10)
+        self.assertNotIn('count', last)
+
+        with self.assertNumQueries(4):
+            page = self.client.get('/api/trades/', {'count': 'false', 'page_size': 5}).data
+        self.assertEqual(len(page['results']), 5)
+        self.assertIsNotNone(page['next'])
+        self.assertEqual(self.client.get('/api/trades/', {'page_size': 5}).data['count'], 7)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/trades/', {'cursor': 'nope'}).status_code, 404)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ImportThinkOrSwimCommandTests(TestCase):
+    def test_bulk_import_merges_statements(self):
+        user = User.objects.create_user('trader')
+        out = io.StringIO()
+        call_command(
+            'import_thinkorswim', str(SAMPLE_STATEMENT.parent), str(PARTIAL_FILLS_STATEMENT),
+            str(PARTIAL_FILLS_STATEMENT.parent / '*.csv'), user='trader', workers=2, stdout=out
+        )
+
+        self.assertEqual(Trade.objects.filter(user=user).count(), 8)
+        self.assertIn('rows/sec', out.getvalue())
+        self.assertEqual(ImportedStatement.objects.filter(user=user).count(), 2)
+
+        # The ledger keeps a second run from consuming the stored lots again
+        lots = list(OpenLot.objects.filter(user=user).values_list('position_key', 'quantity'))
+        call_command(
+            'import_thinkorswim', str(SAMPLE_STATEMENT.parent), user='trader', workers=1, stdout=out
+        )
+        self.assertEqual(Trade.objects.filter(user=user).count(), 8)
+        self.assertEqual(list(OpenLot.objects.filter(user=user).values_list('position_key', 'quantity')), lots)
+
+    def test_overlapping_statements_are_not_double_counted(self):
+        command = import_thinkorswim.Command()
+        executions = [execution(0, 'TO OPEN', 5, 10.0), execution(1, 'TO CLOSE', 5, 11.0, side='SELL')]
+
+        merged = command.merge_executions([executions, executions[1:], executions])
+        self.assertEqual(merged, executions)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class StatementLedgerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('trader')
+        self.content = PARTIAL_FILLS_STATEMENT.read_text(encoding='utf-8-sig')
+        import_statement(self.user, self.content)
+
+    def test_identical_statement_is_not_parsed_again(self):
+        with self.assertNumQueries(1):
+            result = import_statement(self.user, self.content)
+
+        self.assertTrue(result['duplicate_statement'])
+        self.assertEqual(result['rows_parsed'], 0)
+
+    def test_overlapping_statement_only_imports_new_days(self):
+        extended = self.content.replace('through 3/6/25', 'through 3/10/25').replace(
+            'Order Type\n',
+            'Order Type\n'
+            ',3/7/25 10:05:00,STOCK,SELL,-10,TO CLOSE,VAL,,,STOCK,35.00,35.00,LMT\n'
+            ',3/7/25 10:00:00,STOCK,BUY,+10,TO OPEN,VAL,,,STOCK,34.00,34.00,LMT\n'
+        )
+        result = import_statement(self.user, extended)
+
+        self.assertFalse(result['duplicate_statement'])
+        self.assertEqual(result['executions_skipped'], 10)
+        self.assertEqual(result['trades_created'], 1)
+        self.assertEqual(result['duplicates_skipped'], 0)
+        statement = ImportedStatement.objects.filter(user=self.user).first()
+        self.assertEqual(statement.account, 'D-68705401')
+        self.assertEqual(statement.period_end, date(2025, 3, 10))
+
+    def test_statement_exported_mid_day_only_covers_its_executions(self):
+        statement = ImportedStatement.objects.get(user=self.user)
+        self.assertIsNotNone(statement.last_execution)
+        day = f'{statement.last_execution:%-m/%-d/%y}'
+        later = f'{statement.last_execution + timedelta(hours=1):%H:%M:%S}'
+        extended = self.content.replace(
+            'Order Type\n',
+            'Order Type\n'
+            f',{day} {later},STOCK,SELL,-10,TO CLOSE,VAL,,,STOCK,35.00,35.00,LMT\n'
+            f',{day} {later},STOCK,BUY,+10,TO OPEN,VAL,,,STOCK,34.00,34.00,LMT\n'
+        )
+        trades = Trade.objects.filter(user=self.user).count()
+        result = import_statement(self.user, extended)
+
+        self.assertEqual(result['executions_skipped'], 10)
+        self.assertEqual(result['trades_created'], 1)
+        self.assertEqual(Trade.objects.filter(user=self.user).count(), trades + 1)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class OpenLotLedgerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('trader')
+
+    def test_open_lot_is_closed_by_later_import(self):
+        match_executions(self.user, [execution(0, 'TO OPEN', 10, 10.0)])
+        self.assertEqual(OpenLot.objects.get(user=self.user).quantity, 10)
+
+        result = match_executions(self.user, [execution(5, 'TO CLOSE', 4, 12.0, side='SELL')])
+        self.assertEqual(result['trades_created'], 1)
+        self.assertEqual(Trade.objects.get(user=self.user).profit_loss, 8)
+        self.assertEqual(OpenLot.objects.get(user=self.user).quantity, 6)
+
+        match_executions(self.user, [execution(9, 'TO CLOSE', 6, 9.0, side='SELL')])
+        self.assertFalse(OpenLot.objects.filter(user=self.user).exists())
+        self.assertEqual(Trade.objects.filter(user=self.user).count(), 2)
+
+    def test_reimported_close_does_not_consume_the_lot_again(self):
+        match_executions(self.user, [execution(0, 'TO OPEN', 10, 10.0)])
+        closing = [execution(5, 'TO CLOSE', 4, 12.0, side='SELL')]
+        match_executions(self.user, closing)
+        result = match_executions(self.user, closing)
+
+        self.assertEqual((result['trades_created'], result['trades_matched']), (0, 0))
+        self.assertEqual(OpenLot.objects.get(user=self.user).quantity, 6)
+        self.assertEqual(Trade.objects.filter(user=self.user).count(), 1)
+
+        # A statement holding both the open and the close rebuilds the lot from scratch
+        match_executions(self.user, [execution(0, 'TO OPEN', 10, 10.0)] + closing)
+        self.assertEqual(OpenLot.objects.get(user=self.user).quantity, 6)
+
+    def test_reimported_open_is_not_carried_twice(self):
+        opening = [execution(0, 'TO OPEN', 10, 10.0)]
+        match_executions(self.user, opening)
+        match_executions(self.user, opening)
+
+        self.assertEqual(OpenLot.objects.get(user=self.user).quantity, 10)
+
+    def test_spread_legs_and_split_fills_are_all_kept(self):
+        def leg(strike, minute, pos_effect, side, price, qty=1):
+            return dict(
+                execution(minute, pos_effect, qty, price, side=side),
+                spread='VERTICAL', exp='21 MAR 25', strike=strike, type='CALL'
+            )
+
+        result = match_executions(self.user, [
+            # Both legs of a vertical spread, opened and closed together
+            leg('170', 0, 'TO OPEN', 'BUY', 5.0),
+            leg('175', 0, 'TO OPEN', 'SELL', 3.0),
+            leg('170', 5, 'TO CLOSE', 'SELL', 6.0),
+            leg('175', 5, 'TO CLOSE', 'BUY', 3.5),
+            # One stock lot closed by two fills in the same second
+            execution(10, 'TO OPEN', 10, 10.0),
+            execution(20, 'TO CLOSE', 4, 12.0, side='SELL'),
+            execution(20, 'TO CLOSE', 6, 13.0, side='SELL'),
+        ])
+
+        self.assertEqual(result['trades_matched'], 3)
+        self.assertEqual((result['trades_created'], result['duplicates_skipped']), (3, 0))
+        trades = Trade.objects.filter(user=self.user).order_by('contract', 'entry_date')
+        self.assertEqual(
+            [(t.contract, t.profit_loss, t.exit_price) for t in trades],
+            [('', Decimal('26.00'), Decimal('12.60')),
+             ('CALL 170 21 MAR 25', Decimal('100.00'), Decimal('6.00')),
+             ('CALL 175 21 MAR 25', Decimal('-50.00'), Decimal('3.50'))]
+        )
+
+
+class StatementGeneratorTests(SimpleTestCase):
+    def test_generated_statement_parses(self):
+        stream = io.StringIO()
+        StatementGenerator(500, seed=3).write(stream)
+        parser = ThinkOrSwimParser(stream.getvalue())
+        result = parser.parse()
+
+        self.assertEqual(parser.rows_parsed, 500)
+        self.assertEqual(parser.errors, [])
+        self.assertEqual(parser.statement_info['account'], 'D-00000000')
+        self.assertEqual({t['trade_type'] for t in result['trades']}, {'STOCK', 'OPTION'})
+        self.assertTrue(all(t['fees'] >= 0 for t in result['trades']))
+
+    def test_same_seed_same_statement(self):
+        first, second = io.StringIO(), io.StringIO()
+        StatementGenerator(100, seed=7).write(first)
+        StatementGenerator(100, seed=7).write(second)
+        self.assertEqual(first.getvalue(), second.getvalue())
@@ -8,6 +8,7 @@ router.register(r'tags', views.TagViewSet, basename='tag')
 router.register(r'trades', views.TradeViewSet, basename='trade')
 router.register(r'journal', views.JournalEntryViewSet, basename='journal')
 router.register(r'tag-categories', views.TagCategoryViewSet, basename='tagcategory')
+router.register(r'import-jobs', views.ImportJobViewSet, basename='importjob')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,24 +1,124 @@
 from django.shortcuts import render
-from django.db import models, transaction
+from django.core.exceptions import ValidationError
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.db import IntegrityError, models, transaction
 from rest_framework import viewsets, permissions, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Count, Avg, Sum, Q
+from django.db.models import Count, Sum, Q, F, Prefetch, Window, Case, When, Value
+from django.db.models.functions import (
+    Coalesce, ExtractHour, ExtractIsoWeekDay, RowNumber, TruncDay, TruncMonth, TruncQuarter, TruncWeek
+)
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import TradeRule, Tag, Trade, JournalEntry, TagCategory
+from .models import TradeRule, Tag, Trade, JournalEntry, TagCategory, ImportJob, DailyPnL
 from .serializers import (
     TradeRuleSerializer, TagSerializer, TradeSerializer, 
-    JournalEntrySerializer, TagCategorySerializer
+    JournalEntrySerializer, TagCategorySerializer, ImportJobSerializer,
+    requested_fields, value_columns, values_representation
 )
-import pandas as pd
+from .analytics import equity_curve, lttb, monte_carlo
+from .bulk import create_trades, delete_trades, update_trades
+from .cache import bump_version, cached_analytics, data_version, row_validators
+from .distributions import histogram
+from .expressions import HoldingSeconds, holding_bucket
+from .pagination import KeysetPagination
+from .rolling import record_trades, rolling_metrics
+from .rollups import paused
+import math
+import time
 import numpy as np
-from datetime import datetime
+from datetime import date, datetime
 from decimal import Decimal
 import re
 import json
+import csv
+from itertools import islice
 
 # Create your views here.
 
+def tags_with_categories():
+    """Prefetch for the nested TagSerializer, which reads each tag's category"""
+    return Prefetch('tags', queryset=Tag.objects.select_related('category'))
+
+def query_date(request, name):
+    """A YYYY-MM-DD query parameter as a date, or None when it is absent.
+
+    Raises ValueError when the parameter is not a valid date.
+    """
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'{name} must be a date in YYYY-MM-DD format')
+
+class SparseFieldsListMixin:
+    """Serve ?fields= list requests from .values() rows instead of per-row serializers"""
+
+    def list(self, request, *args, **kwargs):
+        fields = requested_fields(request)
+        if not fields:
+            return super().list(request, *args, **kwargs)
+
+        # Built without the request, so every field keeps its full definition
+        serializer = self.get_serializer_class()()
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        columns = value_columns(serializer, fields)
+        # Keyset pages need the ordering value of the last row
+        ordering, _ = self.paginator.get_ordering_field(queryset)
+        if ordering not in columns:
+            columns.append(ordering)
+
+        rows = self.paginate_queryset(queryset.values(*columns))
+        data = values_representation(serializer, rows, fields, requested_fields(request, 'expand') or [])
+        return self.get_paginated_response(data)
+
+class ConditionalGetMixin:
+    """Answer list and detail GETs with a 304 when the rows they would return are unchanged
+
+    The ETag and Last-Modified validators cost one indexed aggregate query,
+    so a matching If-None-Match or If-Modified-Since skips fetching and
+    serializing the rows altogether. Last-Modified only has whole seconds,
+    so it is left out while the rows' latest change is in the current
+    second, when another write could follow unseen; the ETag alone
+    validates those responses. When the page reports a total count,
+    the same query counts the rows and leaves the count in row_count for
+    the paginator, which then needs no COUNT(*) of its own.
+    """
+    row_count = None
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        count = isinstance(self.paginator, KeysetPagination) and self.paginator.counts_rows(request)
+        return self.conditional(request, queryset, super().list, *args, count=count, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        try:
+            queryset = self.filter_queryset(self.get_queryset()).filter(**{self.lookup_field: lookup})
+        except (TypeError, ValueError, ValidationError):
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional(request, queryset, super().retrieve, *args, **kwargs)
+
+    def conditional(self, request, queryset, view, *args, count=False, **kwargs):
+        etag, last_modified, self.row_count = row_validators(request, queryset, count)
+        if last_modified >= int(time.time()):
+            last_modified = None
+        # An If-None-Match header takes precedence over If-Modified-Since
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
 class TagCategoryViewSet(viewsets.ModelViewSet):
     serializer_class = TagCategorySerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -31,15 +131,16 @@ class TagCategoryViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
-class TradeRuleViewSet(viewsets.ModelViewSet):
+class TradeRuleViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = TradeRuleSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['title', 'content', 'category']
     ordering_fields = ['created_at', 'updated_at', 'category']
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        return TradeRule.objects.filter(user=self.request.user)
+        return TradeRule.objects.filter(user=self.request.user).order_by('-created_at', '-pk')
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -51,155 +152,40 @@ class TagViewSet(viewsets.ModelViewSet):
     search_fields = ['name', 'description']
 
     def get_queryset(self):
-        return Tag.objects.filter(created_by=self.request.user)
+        return Tag.objects.filter(created_by=self.request.user).select_related('category')
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
-class ThinkOrSwimParser:
-    def __init__(self, content):
-        self.raw_data = content
-        self.trades = []
-        
-    def parse(self):
-        """Parse the ThinkOrSwim CSV statement content using pandas."""
-        try:
-            # Split the content into sections using the headers as delimiters
-            sections = self.raw_data.split('\n\n')
-            trade_history_section = None
-            
-            # Find the trade history section
-            for section in sections:
-                if section.strip().startswith('Account Trade History'):
-                    trade_history_section = section
-                    break
-            
-            if not trade_history_section:
-                print("No trade history section found")
-                return {'trades': []}
-            
-            # Convert the trade history section to a DataFrame
-            trade_lines = trade_history_section.split('\n')
-            # Find the header line (the one that starts with "Exec Time")
-            header_index = next(i for i, line in enumerate(trade_lines) if 'Exec Time' in line)
-            
-            # Create DataFrame from the trade lines
-            df = pd.read_csv(
-                pd.StringIO('\n'.join(trade_lines[header_index:])),
-                skipinitialspace=True,
-                skip_blank_lines=True
-            )
-            
-            # Clean up column names and drop empty columns
-            df.columns = df.columns.str.strip()
-            df = df.dropna(axis=1, how='all')
-            
-            # Process each trade
-            trades = []
-            open_positions = {}
-            
-            # Sort trades by execution time
-            df['Exec Time'] = pd.to_datetime(df['Exec Time'], format='%m/%d/%y %H:%M:%S')
-            df = df.sort_values('Exec Time')
-            
-            for _, row in df.iterrows():
-                try:
-                    # Extract trade details
-                    symbol = row['Symbol']
-                    exec_time = row['Exec Time']
-                    side = row['Side']
-                    pos_effect = row['Pos Effect']
-                    price = float(str(row['Price']).replace('$', '').replace(',', ''))
-                    qty = abs(float(str(row['Qty']).replace('+', '').replace('-', '')))
-                    
-                    # Create position key (include expiration for options)
-                    position_key = f"{symbol}_{row['Exp']}" if pd.notna(row['Exp']) else symbol
-                    
-                    # Determine trade type
-                    trade_type = 'STOCK' if row['Type'] == 'STOCK' else 'OPTION'
-                    
-                    # Calculate position size
-                    position_size = qty * price
-                    if trade_type == 'OPTION':
-                        position_size *= 100
-                    
-                    if pos_effect == 'TO OPEN':
-                        if position_key not in open_positions:
-                            open_positions[position_key] = []
-                        
-                        open_positions[position_key].append({
-                            'entry_date': exec_time,
-                            'ticker_symbol': symbol,
-                            'trade_type': trade_type,
-                            'entry_price': price,
-                            'quantity': qty,
-                            'position_size': position_size,
-                            'side': side,
-                            'expiration': row['Exp'] if pd.notna(row['Exp']) else None,
-                            'strike': row['Strike'] if pd.notna(row['Strike']) else None
-                        })
-                    
-                    elif pos_effect == 'TO CLOSE':
-                        if position_key in open_positions and open_positions[position_key]:
-                            open_trade = open_positions[position_key].pop(0)
-                            
-                            # Calculate P&L
-                            if open_trade['side'] == 'BUY':
-                                profit_loss = (price - open_trade['entry_price']) * qty
-                            else:
-                                profit_loss = (open_trade['entry_price'] - price) * qty
-                            
-                            if trade_type == 'OPTION':
-                                profit_loss *= 100
-                            
-                            trade_data = {
-                                'entry_date': open_trade['entry_date'],
-                                'exit_date': exec_time,
-                                'ticker_symbol': symbol,
-                                'trade_type': trade_type,
-                                'entry_price': open_trade['entry_price'],
-                                'exit_price': price,
-                                'position_size': open_trade['position_size'],
-                                'profit_loss': profit_loss,
-                                'is_win': profit_loss > 0,
-                                'quantity': qty
-                            }
-                            
-                            if trade_type == 'OPTION':
-                                trade_data.update({
-                                    'option_expiration': open_trade['expiration'],
-                                    'option_strike': open_trade['strike']
-                                })
-                            
-                            trades.append(trade_data)
-                
-        except Exception as e:
-                    print(f"Error processing trade: {str(e)}")
-                    continue
-            
-            return {'trades': trades}
-            
-        except Exception as e:
-            print(f"Error parsing CSV: {str(e)}")
-            return {'trades': []}
-
-class TradeViewSet(viewsets.ModelViewSet):
+class TradeViewSet(ConditionalGetMixin, SparseFieldsListMixin, viewsets.ModelViewSet):
     serializer_class = TradeSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['trade_type', 'ticker_symbol', 'is_win', 'tags']
     search_fields = ['ticker_symbol', 'notes']
     ordering_fields = ['entry_date', 'exit_date', 'profit_loss', 'position_size']
+    pagination_class = KeysetPagination
+
+    # Actions that serialize whole trades and so need their tags and rules
+    SERIALIZING_ACTIONS = ('list', 'retrieve', 'update', 'partial_update')
 
     def get_queryset(self):
-        return Trade.objects.filter(user=self.request.user)
+        trades = Trade.objects.filter(user=self.request.user)
+        if self.action in self.SERIALIZING_ACTIONS:
+            trades = trades.prefetch_related(tags_with_categories(), 'rules_followed')
+        return trades
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        previous_version = data_version(self.request.user.pk)
+        trade = serializer.save(user=self.request.user)
+        # Bump after the save's own signals so this is the version the write publishes
+        version = bump_version(self.request.user.pk)
+        # Extend the cached rolling metrics rather than rebuilding them
+        record_trades(self.request.user.pk, [trade], previous_version, version)
 
     @action(detail=False, methods=['post'])
     def import_csv(self, request):
-        """Import trades from a ThinkOrSwim CSV statement."""
+        """Queue a ThinkOrSwim CSV statement for import by the background worker."""
         if 'file' not in request.FILES:
             return Response({'error': 'No file provided'}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -207,53 +193,105 @@ class TradeViewSet(viewsets.ModelViewSet):
         if not csv_file.name.endswith('.csv'):
             return Response({'error': 'File must be a CSV'}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            # Read the CSV content
-            content = csv_file.read().decode('utf-8')
-            
-            # Parse trades using pandas-based parser
-            parser = ThinkOrSwimParser(content)
-            result = parser.parse()
-            trades = result['trades']
-            
-            if not trades:
-                return Response({
-                    'error': 'No trades found in CSV file',
-                    'message': 'Failed to import trades'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Create trades in database
-            trades_created = 0
-            for trade_data in trades:
-                try:
-                    # Check for duplicate trade
-                    existing_trade = Trade.objects.filter(
-                        user=request.user,
-                        ticker_symbol=trade_data['ticker_symbol'],
-                        entry_date=trade_data['entry_date'],
-                        exit_date=trade_data['exit_date'],
-                        trade_type=trade_data['trade_type']
-                    ).first()
-                    
-                    if not existing_trade:
-                        trade_data['user'] = request.user
-                        Trade.objects.create(**trade_data)
-                        trades_created += 1
-                
-                except Exception as e:
-                    print(f"Error creating trade: {str(e)}")
-                    continue
-            
-            return Response({
-                'message': f'Successfully imported {trades_created} trades',
-                'trades_created': trades_created
-            })
+        # Queue the statement for the import worker and return straight away
+        job = ImportJob.objects.create(
+            user=request.user,
+            file=csv_file,
+            original_name=csv_file.name
+        )
+        return Response({
+            'message': 'Import queued',
+            'job_id': job.pk,
+            'status': job.status
+        }, status=status.HTTP_202_ACCEPTED)
 
-        except Exception as e:
-            return Response({
-                'error': str(e),
-                'message': 'Failed to import trades'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    EXPORT_COLUMNS = [
+        'trade_id', 'entry_date', 'exit_date', 'trade_type', 'ticker_symbol', 'contract', 'entry_price',
+        'exit_price', 'position_size', 'fees', 'profit_loss', 'is_win', 'execution_rating', 'notes'
+    ]
+    EXPORT_CHUNK_SIZE = 2000
+
+    def iter_export_rows(self, queryset):
+        """Yield export rows with their tag names, reading trades and tags one chunk at a time"""
+        rows = queryset.values(*self.EXPORT_COLUMNS).iterator(chunk_size=self.EXPORT_CHUNK_SIZE)
+        while True:
+            chunk = list(islice(rows, self.EXPORT_CHUNK_SIZE))
+            if not chunk:
+                return
+            tags = {}
+            for trade_id, name in Trade.tags.through.objects.filter(
+                trade_id__in=[row['trade_id'] for row in chunk]
+            ).order_by('tag__name').values_list('trade_id', 'tag__name'):
+                tags.setdefault(trade_id, []).append(name)
+            for row in chunk:
+                row['tags'] = tags.get(row['trade_id'], [])
+                yield row
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream the user's filtered trades as CSV or NDJSON (?output=csv|ndjson)"""
+        output = request.query_params.get('output', 'csv')
+        if output not in ('csv', 'ndjson'):
+            return Response({'detail': 'output must be csv or ndjson'}, status=400)
+
+        rows = self.iter_export_rows(self.filter_queryset(self.get_queryset()))
+
+        def value(item):
+            if item is None:
+                return ''
+            return item.isoformat() if isinstance(item, datetime) else str(item)
+
+        class Echo:
+            """File-like object for csv.writer that hands each line back instead of storing it"""
+            def write(self, line):
+                return line
+
+        def csv_lines():
+            writer = csv.writer(Echo())
+            yield writer.writerow(self.EXPORT_COLUMNS + ['tags'])
+            for row in rows:
+                yield writer.writerow([value(row[column]) for column in self.EXPORT_COLUMNS] + [';'.join(row['tags'])])
+
+        def ndjson_lines():
+            for row in rows:
+                yield json.dumps(row, default=value) + '\n'
+
+        if output == 'csv':
+            content, content_type = csv_lines(), 'text/csv'
+        else:
+            content, content_type = ndjson_lines(), 'application/x-ndjson'
+
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="trades.{output}"'
+        return response
+
+    BULK_LIMIT = 5000
+
+    @action(detail=False, methods=['post', 'patch', 'delete'])
+    def bulk(self, request):
+        """Create (POST), update (PATCH) or delete (DELETE) many trades in one transaction.
+
+        POST takes a list of trades and PATCH a list of partial trades with
+        their trade_id; DELETE takes a list of trade ids. Each item gets its
+        own result, and items that fail are reported without stopping the rest.
+        """
+        items = request.data
+        if not isinstance(items, list):
+            return Response({'detail': 'Expected a list of items'}, status=400)
+        if len(items) > self.BULK_LIMIT:
+            return Response({'detail': f'At most {self.BULK_LIMIT} items per request'}, status=400)
+
+        write = {'POST': create_trades, 'PATCH': update_trades, 'DELETE': delete_trades}[request.method]
+        try:
+            results = write(request.user, items)
+        except IntegrityError:
+            return Response({'detail': 'Two trades would share the same ticker, dates and type'}, status=409)
+        failed = sum(result['status'] == 'error' for result in results)
+        return Response({
+            'succeeded': len(results) - failed,
+            'failed': failed,
+            'results': results
+        })
 
     @action(detail=False, methods=['delete'])
     def delete_all(self, request):
@@ -261,7 +299,10 @@ class TradeViewSet(viewsets.ModelViewSet):
         try:
             trades = self.get_queryset()
             count = trades.count()
-            trades.delete()
+            with transaction.atomic(), paused():
+                trades.delete()
+                DailyPnL.objects.filter(user=request.user).delete()
+            bump_version(request.user.pk)
             return Response({
                 'message': f'Successfully deleted {count} trades',
                 'count': count
@@ -273,14 +314,25 @@ class TradeViewSet(viewsets.ModelViewSet):
             )
 
     @action(detail=False, methods=['get'])
+    @cached_analytics()
     def statistics(self, request):
         """Get trading statistics for the authenticated user"""
         try:
             trades = self.get_queryset()
-            completed_trades = trades.filter(exit_price__isnull=False)
-            
+            completed_trades = trades.filter(exit_price__isnull=False).order_by()
+
+            # Scalar metrics come from the daily rollup, so they cost one
+            # aggregate over trading days rather than over trades
+            totals = DailyPnL.objects.filter(user=request.user).aggregate(
+                total_trades=Sum('trade_count'),
+                winning_trades=Sum('wins'),
+                losing_trades=Sum('losses'),
+                total_profit=Sum('gross_profit'),
+                total_loss=Sum('gross_loss')
+            )
+
             # Basic statistics
-            total_trades = completed_trades.count()
+            total_trades = totals['total_trades'] or 0
             if total_trades == 0:
                 return Response({
                     'total_trades': 0,
@@ -294,52 +346,41 @@ class TradeViewSet(viewsets.ModelViewSet):
                     'strategy_performance': []
                 })
             
-            winning_trades = completed_trades.filter(is_win=True).count()
+            winning_trades = totals['winning_trades']
             win_rate = (winning_trades / total_trades * 100) if total_trades > 0 else 0
             
             # Profit statistics
-            total_profit = completed_trades.filter(profit_loss__gt=0).aggregate(
-                Sum('profit_loss'))['profit_loss__sum'] or 0
-            total_loss = abs(completed_trades.filter(profit_loss__lt=0).aggregate(
-                Sum('profit_loss'))['profit_loss__sum'] or 0)
+            total_profit = totals['total_profit'] or 0
+            total_loss = abs(totals['total_loss'] or 0)
             profit_factor = total_profit / total_loss if total_loss > 0 else float('inf')
             
             # Average trade metrics
-            avg_profit = completed_trades.filter(profit_loss__gt=0).aggregate(
-                Avg('profit_loss'))['profit_loss__avg'] or 0
-            avg_loss = completed_trades.filter(profit_loss__lt=0).aggregate(
-                Avg('profit_loss'))['profit_loss__avg'] or 0
+            avg_profit = total_profit / totals['winning_trades'] if totals['winning_trades'] else 0
+            avg_loss = -total_loss / totals['losing_trades'] if totals['losing_trades'] else 0
             
-            # Strategy performance - handle trades with no tags
-            strategy_performance = []
-            
-            # First, get performance for trades with tags
-            tagged_performance = completed_trades.exclude(tags=None).values('tags__name').annotate(
-                total_trades=Count('id'),
-                win_rate=Count('id', filter=Q(is_win=True)) * 100.0 / Count('id'),
+            # Strategy performance in one grouped query; the LEFT JOIN on tags
+            # puts trades without tags in a group of their own with no name
+            performance = completed_trades.values('tags__name').annotate(
+                total_trades=Count('pk'),
+                win_rate=Count('pk', filter=Q(is_win=True)) * 100.0 / Count('pk'),
                 total_pnl=Sum('profit_loss')
             ).order_by('-total_pnl')
             
-            strategy_performance.extend([{
-                'name': item['tags__name'] or 'Unknown',
-                'total_trades': item['total_trades'],
-                'win_rate': round(float(item['win_rate']), 2),
-                'total_pnl': float(item['total_pnl'])
-            } for item in tagged_performance])
-            
-            # Then, get performance for trades without tags
-            untagged_trades = completed_trades.filter(tags=None)
-            if untagged_trades.exists():
-                untagged_count = untagged_trades.count()
-                untagged_wins = untagged_trades.filter(is_win=True).count()
-                untagged_pnl = untagged_trades.aggregate(Sum('profit_loss'))['profit_loss__sum'] or 0
-                
-                strategy_performance.append({
-                    'name': 'Untagged',
-                    'total_trades': untagged_count,
-                    'win_rate': round(float(untagged_wins * 100.0 / untagged_count), 2),
-                    'total_pnl': float(untagged_pnl)
-                })
+            strategy_performance = []
+            untagged = None
+            for item in performance:
+                summary = {
+                    'name': item['tags__name'] or 'Untagged',
+                    'total_trades': item['total_trades'],
+                    'win_rate': round(float(item['win_rate']), 2),
+                    'total_pnl': float(item['total_pnl'] or 0)
+                }
+                if item['tags__name'] is None:
+                    untagged = summary
+                else:
+                    strategy_performance.append(summary)
+            if untagged:
+                strategy_performance.append(untagged)
 
             return Response({
                 'total_trades': total_trades,
@@ -363,6 +404,7 @@ class TradeViewSet(viewsets.ModelViewSet):
             )
 
     @action(detail=False, methods=['get'])
+    @cached_analytics()
     def weekly_summary(self, request):
         """Get weekly trading summary for the specified date range"""
         start_date = request.query_params.get('start_date')
@@ -374,12 +416,24 @@ class TradeViewSet(viewsets.ModelViewSet):
                 status=400
             )
         
+        totals = DailyPnL.objects.filter(
+            user=request.user,
+            date__gte=start_date,
+            date__lte=end_date
+        ).aggregate(
+            total_trades=Sum('trade_count'),
+            winning_trades=Sum('wins'),
+            total_pnl=Sum('net_pnl')
+        )
+        
         trades = self.get_queryset().filter(
             entry_date__date__gte=start_date,
             entry_date__date__lte=end_date
         )
+        # The rollup only holds closed trades, but open ones count too
+        open_trades = trades.filter(exit_price__isnull=True).count()
         
-        total_trades = trades.count()
+        total_trades = (totals['total_trades'] or 0) + open_trades
         if total_trades == 0:
             return Response({
                 'total_trades': 0,
@@ -389,13 +443,13 @@ class TradeViewSet(viewsets.ModelViewSet):
                 'best_trade': None
             })
         
-        winning_trades = trades.filter(is_win=True).count()
+        winning_trades = totals['winning_trades'] or 0
         win_rate = (winning_trades / total_trades * 100)
         
-        total_pnl = trades.aggregate(Sum('profit_loss'))['profit_loss__sum'] or 0
+        total_pnl = totals['total_pnl'] or 0
         average_trade = total_pnl / total_trades
         
-        best_trade = trades.order_by('-profit_loss').first()
+        best_trade = trades.filter(exit_price__isnull=False).order_by('-profit_loss').first()
         
         return Response({
             'total_trades': total_trades,
@@ -409,16 +463,346 @@ class TradeViewSet(viewsets.ModelViewSet):
             } if best_trade else None
         })
 
-class JournalEntryViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'])
+    @cached_analytics()
+    def equity_curve(self, request):
+        """Cumulative P&L of closed trades with drawdown, expectancy, risk ratios and streaks"""
+        closed = self.get_queryset().filter(exit_price__isnull=False).annotate(
+            closed_at=Coalesce('exit_date', 'entry_date')
+        ).order_by('closed_at', 'pk').values_list('closed_at', 'profit_loss')
+
+        times = []
+        pnl = []
+        for closed_at, profit_loss in closed:
+            times.append(int(closed_at.timestamp()))
+            pnl.append(profit_loss or 0)
+        times = np.array(times, dtype=np.int64).astype('datetime64[s]')
+        return Response(equity_curve(times, np.array(pnl, dtype=np.float64)))
+
+    SUMMARY_PERIODS = {
+        'week': TruncWeek,
+        'month': TruncMonth,
+        'quarter': TruncQuarter,
+    }
+
+    @action(detail=False, methods=['get'])
+    @cached_analytics()
+    def period_summary(self, request):
+        """Get the weekly_summary figures for every week, month or quarter in a date range"""
+        period = request.query_params.get('period', 'week')
+        try:
+            start_date = query_date(request, 'start_date')
+            end_date = query_date(request, 'end_date')
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=400)
+
+        if not start_date or not end_date:
+            return Response(
+                {'detail': 'start_date and end_date are required'},
+                status=400
+            )
+        if period not in self.SUMMARY_PERIODS:
+            return Response(
+                {'detail': f"period must be one of {', '.join(self.SUMMARY_PERIODS)}"},
+                status=400
+            )
+        truncate = self.SUMMARY_PERIODS[period]
+
+        # Totals per period, grouped from the daily rollup
+        totals = DailyPnL.objects.filter(
+            user=request.user,
+            date__gte=start_date,
+            date__lte=end_date
+        ).annotate(period=truncate('date')).values('period').annotate(
+            total_trades=Sum('trade_count'),
+            winning_trades=Sum('wins'),
+            total_pnl=Sum('net_pnl')
+        ).order_by('period')
+
+        # Best trade and number of open trades per period, from window
+        # functions in the same pass; closed trades rank ahead of open ones
+        is_open = Case(When(exit_price__isnull=True, then=Value(1)), default=Value(0))
+        best_trades = self.get_queryset().filter(
+            entry_date__date__gte=start_date,
+            entry_date__date__lte=end_date
+        ).annotate(
+            period=truncate('entry_date', output_field=models.DateField()),
+            open_trades=Window(Sum(is_open), partition_by=[F('period')]),
+            rank=Window(
+                RowNumber(),
+                partition_by=[F('period')],
+                order_by=[is_open.asc(), F('profit_loss').desc(nulls_last=True), F('pk').asc()]
+            )
+        ).filter(rank=1).values('period', 'ticker_symbol', 'trade_type', 'exit_price', 'profit_loss', 'open_trades')
+        best = {row['period']: row for row in best_trades}
+        closed = {row['period']: row for row in totals}
+
+        periods = []
+        for start in sorted(closed.keys() | best.keys()):
+            row = closed.get(start, {})
+            trade = best.get(start)
+            total_trades = row.get('total_trades', 0) + (trade['open_trades'] if trade else 0)
+            total_pnl = row.get('total_pnl') or 0
+            periods.append({
+                'period_start': start,
+                'total_trades': total_trades,
+                'win_rate': round(row.get('winning_trades', 0) / total_trades * 100, 1),
+                'total_pnl': float(total_pnl),
+                'average_trade': float(total_pnl / total_trades),
+                'best_trade': {
+                    'symbol': trade['ticker_symbol'],
+                    'type': trade['trade_type'],
+                    'profit': float(trade['profit_loss'] or 0)
+                } if trade and trade['exit_price'] is not None else None
+            })
+        return Response({'period': period, 'periods': periods})
+
+    SERIES_BUCKETS = {
+        'hour': ExtractHour,
+        'day': TruncDay,
+        'week': TruncWeek,
+        'month': TruncMonth,
+    }
+
+    @action(detail=False, methods=['get'])
+    @cached_analytics()
+    def pnl_series(self, request):
+        """Trade count, wins and net P&L of closed trades per hour of day, day, week or month"""
+        bucket = request.query_params.get('bucket', 'day')
+        if bucket not in self.SERIES_BUCKETS:
+            return Response(
+                {'detail': f"bucket must be one of {', '.join(self.SERIES_BUCKETS)}"},
+                status=400
+            )
+        try:
+            points = int(request.query_params.get('points', 0))
+        except ValueError:
+            return Response({'detail': 'points must be an integer'}, status=400)
+        # LTTB keeps the first and last points, so it needs room for one more
+        if 'points' in request.query_params and points < 3:
+            return Response({'detail': 'points must be at least 3'}, status=400)
+        try:
+            start_date = query_date(request, 'start_date')
+            end_date = query_date(request, 'end_date')
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=400)
+
+        trades = self.get_queryset().filter(exit_price__isnull=False, exit_date__isnull=False)
+        if start_date:
+            trades = trades.filter(exit_date__date__gte=start_date)
+        if end_date:
+            trades = trades.filter(exit_date__date__lte=end_date)
+
+        series = list(
+            trades.annotate(bucket=self.SERIES_BUCKETS[bucket]('exit_date'))
+            .values('bucket')
+            .annotate(
+                trades=Count('pk'),
+                wins=Count('pk', filter=Q(profit_loss__gt=0)),
+                net_pnl=Sum('profit_loss')
+            )
+            .order_by('bucket')
+        )
+
+        buckets = [row['bucket'] for row in series]
+        net_pnl = np.array([float(row['net_pnl'] or 0) for row in series])
+        total_buckets = len(series)
+        # Hours of the day are at most 24 buckets and never need downsampling
+        if points and bucket != 'hour':
+            positions = np.array([b.timestamp() for b in buckets])
+            kept = lttb(positions, net_pnl, points)
+            series = [series[i] for i in kept]
+            buckets = [buckets[i] for i in kept]
+            net_pnl = net_pnl[kept]
+
+        return Response({
+            'bucket': bucket,
+            'total_buckets': total_buckets,
+            'buckets': buckets if bucket == 'hour' else [b.isoformat() for b in buckets],
+            'trades': [row['trades'] for row in series],
+            'wins': [row['wins'] for row in series],
+            'net_pnl': np.round(net_pnl, 2).tolist()
+        })
+
+    @action(detail=False, methods=['get'])
+    @cached_analytics()
+    def rolling(self, request):
+        """Rolling win rate, expectancy and profit factor over the last N trades or N days"""
+        unit = request.query_params.get('unit', 'trades')
+        if unit not in ('trades', 'days'):
+            return Response({'detail': 'unit must be trades or days'}, status=400)
+        try:
+            window = int(request.query_params.get('window', 20))
+        except ValueError:
+            window = 0
+        if window < 1:
+            return Response({'detail': 'window must be a positive integer'}, status=400)
+
+        series = rolling_metrics(request.user.pk).series(window, unit)
+
+        def rounded(values, places):
+            return [None if np.isnan(v) else v for v in np.round(values, places).tolist()]
+
+        return Response({
+            'window': window,
+            'unit': unit,
+            'times': np.datetime_as_string(series['times'], unit='s').tolist(),
+            'trades': series['trades'].tolist(),
+            'win_rate': rounded(series['win_rate'], 2),
+            'expectancy': rounded(series['expectancy'], 2),
+            'profit_factor': rounded(series['profit_factor'], 4)
+        })
+
+    HISTOGRAM_FIELDS = {
+        'profit_loss': F('profit_loss'),
+        'position_size': F('position_size'),
+        'holding_time': HoldingSeconds('entry_date', 'exit_date'),
+    }
+    MAX_HISTOGRAM_BINS = 500
+
+    @action(detail=False, methods=['get'])
+    @cached_analytics()
+    def histogram(self, request):
+        """Distribution of P&L, position size or holding time (seconds) of closed trades"""
+        field = request.query_params.get('field', 'profit_loss')
+        mode = request.query_params.get('mode', 'fixed')
+        if field not in self.HISTOGRAM_FIELDS:
+            return Response(
+                {'detail': f"field must be one of {', '.join(self.HISTOGRAM_FIELDS)}"},
+                status=400
+            )
+        if mode not in ('fixed', 'quantile'):
+            return Response({'detail': 'mode must be fixed or quantile'}, status=400)
+        try:
+            bins = int(request.query_params.get('bins', 20))
+        except ValueError:
+            bins = 0
+        if not 1 <= bins <= self.MAX_HISTOGRAM_BINS:
+            return Response(
+                {'detail': f'bins must be between 1 and {self.MAX_HISTOGRAM_BINS}'},
+                status=400
+            )
+
+        trades = self.get_queryset().filter(exit_price__isnull=False).order_by()
+        result = histogram(trades, self.HISTOGRAM_FIELDS[field], bins, mode)
+        return Response({'field': field, 'mode': mode, **result})
+
+    MONTE_CARLO_LIMITS = {
+        'simulations': (1, 100000),
+        'trades': (1, 100000),
+    }
+    # Most simulated trades (simulations x trades) one request may ask for
+    MONTE_CARLO_MAX_CELLS = 20_000_000
+
+    @action(detail=False, methods=['get'])
+    @cached_analytics()
+    def monte_carlo(self, request):
+        """Simulate equity paths by resampling the user's per-trade P&L"""
+        params = request.query_params
+        try:
+            options = {
+                'simulations': int(params.get('simulations', 1000)),
+                'trades': int(params['trades']) if params.get('trades') else None,
+                'seed': int(params.get('seed', 0)),
+                'starting_equity': float(params.get('starting_equity', 10000)),
+                'ruin_fraction': float(params.get('ruin', 0.5)),
+            }
+        except ValueError as e:
+            return Response({'detail': f'Invalid parameter: {e}'}, status=400)
+        for name, (low, high) in self.MONTE_CARLO_LIMITS.items():
+            if options[name] is not None and not low <= options[name] <= high:
+                return Response({'detail': f'{name} must be between {low} and {high}'}, status=400)
+        if (options['seed'] < 0 or not math.isfinite(options['starting_equity'])
+                or options['starting_equity'] <= 0 or not 0 < options['ruin_fraction'] <= 1):
+            return Response(
+                {'detail': 'seed must be non-negative, starting_equity finite and positive and ruin between 0 and 1'},
+                status=400
+            )
+        max_trades = self.MONTE_CARLO_MAX_CELLS // options['simulations']
+        if options['trades'] is not None and options['trades'] > max_trades:
+            return Response(
+                {'detail': f'simulations x trades must be at most {self.MONTE_CARLO_MAX_CELLS}'},
+                status=400
+            )
+
+        pnl = np.array(
+            self.get_queryset().filter(exit_price__isnull=False, profit_loss__isnull=False)
+            .order_by('pk').values_list('profit_loss', flat=True),
+            dtype=np.float64
+        )
+        if not len(pnl):
+            return Response({'detail': 'No closed trades to simulate'}, status=400)
+        if options['trades'] is None:
+            # Paths as long as the trade history, within the same limits
+            options['trades'] = min(len(pnl), self.MONTE_CARLO_LIMITS['trades'][1], max_trades)
+        return Response(monte_carlo(pnl, **options))
+
+    # Dimensions the pivot can group by; None means a plain Trade field
+    PIVOT_DIMENSIONS = {
+        'tag': F('tags__name'),
+        'tag_category': F('tags__category__name'),
+        'ticker_symbol': None,
+        'trade_type': None,
+        'weekday': ExtractIsoWeekDay('entry_date'),
+        'hour': ExtractHour('entry_date'),
+        'holding_time': holding_bucket(),
+    }
+    PIVOT_LABELS = {'tag': 'Untagged', 'tag_category': 'Uncategorized'}
+    MAX_PIVOT_DIMENSIONS = 3
+
+    @action(detail=False, methods=['get'])
+    @cached_analytics()
+    def pivot(self, request):
+        """Trade count, win rate and P&L of closed trades for every combination of up to three dimensions"""
+        dimensions = [d for d in request.query_params.get('dimensions', 'tag').split(',') if d]
+        unknown = [d for d in dimensions if d not in self.PIVOT_DIMENSIONS]
+        if unknown or not dimensions or len(dimensions) > self.MAX_PIVOT_DIMENSIONS:
+            return Response(
+                {'detail': f"dimensions must be up to {self.MAX_PIVOT_DIMENSIONS} of "
+                           f"{', '.join(self.PIVOT_DIMENSIONS)}"},
+                status=400
+            )
+
+        annotations = {
+            d: self.PIVOT_DIMENSIONS[d] for d in dimensions if self.PIVOT_DIMENSIONS[d] is not None
+        }
+        cells = self.get_queryset().filter(exit_price__isnull=False).annotate(**annotations).values(
+            *dimensions
+        ).annotate(
+            total_trades=Count('pk'),
+            winning_trades=Count('pk', filter=Q(is_win=True)),
+            total_pnl=Sum('profit_loss')
+        ).order_by(*[F(d).asc(nulls_last=True) for d in dimensions])
+
+        return Response({
+            'dimensions': dimensions,
+            'cells': [{
+                **{d: self.PIVOT_LABELS[d] if cell[d] is None and d in self.PIVOT_LABELS else cell[d]
+                   for d in dimensions},
+                'total_trades': cell['total_trades'],
+                'win_rate': round(cell['winning_trades'] * 100.0 / cell['total_trades'], 2),
+                'total_pnl': float(cell['total_pnl'] or 0)
+            } for cell in cells]
+        })
+
+class JournalEntryViewSet(ConditionalGetMixin, SparseFieldsListMixin, viewsets.ModelViewSet):
     serializer_class = JournalEntrySerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['type', 'mood', 'tags']
     search_fields = ['title', 'content']
     ordering_fields = ['date', 'created_at']
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        return JournalEntry.objects.filter(user=self.request.user)
+        return JournalEntry.objects.filter(user=self.request.user).prefetch_related(tags_with_categories())
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+
+class ImportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    serializer_class = ImportJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return ImportJob.objects.filter(user=self.request.user)
@@ -0,0 +1,149 @@
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import DatabaseError, connection
+from django.db.models import F
+from django.utils import timezone
+
+from .importers import import_statement
+from .models import ImportJob
+
+
+class ImportWorker:
+    """Database-backed worker that runs queued ImportJobs.
+
+    Jobs are claimed with a conditional UPDATE, so several workers can poll the
+    same table without a broker. A thread refreshes a running job's heartbeat
+    for as long as the job runs, through parsing, matching and saving alike;
+    jobs whose heartbeat goes stale (the worker died or was restarted) are put
+    back in the queue. Re-running a job is safe: the statement's ledger row
+    commits together with its trades and open lots, and closes whose trades
+    already exist do not consume stored lots again. The uploaded statement
+    is deleted once its job has finished or failed for good.
+    """
+    POLL_INTERVAL = 2
+    STALE_AFTER = timedelta(minutes=5)
+    HEARTBEAT_EVERY = timedelta(minutes=1)
+    MAX_ATTEMPTS = 3
+
+    def __init__(self, name=None, poll_interval=None):
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.poll_interval = poll_interval or self.POLL_INTERVAL
+
+    def requeue_stale(self):
+        """Return jobs abandoned by a dead worker to the queue."""
+        stale = ImportJob.objects.filter(
+            status='RUNNING',
+            heartbeat_at__lt=timezone.now() - self.STALE_AFTER
+        )
+        exhausted = dict(stale.filter(attempts__gte=self.MAX_ATTEMPTS).values_list('pk', 'file'))
+        failed = ImportJob.objects.filter(pk__in=exhausted, status='RUNNING').update(
+            status='FAILED',
+            finished_at=timezone.now(),
+            errors=['Import was interrupted too many times'],
+            file=''
+        )
+        storage = ImportJob._meta.get_field('file').storage
+        for name in exhausted.values():
+            if name:
+                storage.delete(name)
+        requeued = stale.update(status='PENDING', worker='')
+        return requeued + failed
+
+    def claim(self, job):
+        """Atomically take a pending job; returns it refreshed, or None if another worker got it."""
+        now = timezone.now()
+        claimed = ImportJob.objects.filter(pk=job.pk, status='PENDING').update(
+            status='RUNNING',
+            worker=self.name,
+            attempts=F('attempts') + 1,
+            started_at=now,
+            heartbeat_at=now
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+        return None
+
+    def claim_next(self):
+        """Atomically take the oldest pending job, or return None."""
+        while True:
+            job = ImportJob.objects.filter(status='PENDING').order_by('created_at').first()
+            if job is None:
+                return None
+            if self.claim(job) is not None:
+                return job
+
+    def beat(self, job, **fields):
+        """Refresh the heartbeat of a job this worker still holds."""
+        return ImportJob.objects.filter(pk=job.pk, status='RUNNING', worker=self.name).update(
+            heartbeat_at=timezone.now(), **fields
+        )
+
+    @contextmanager
+    def heartbeat(self, job):
+        """Keep the job's heartbeat fresh from a background thread until the block exits."""
+        stop = threading.Event()
+
+        def run():
+            try:
+                while not stop.wait(self.HEARTBEAT_EVERY.total_seconds()):
+                    try:
+                        self.beat(job)
+                    except DatabaseError:
+                        # e.g. SQLite locked by the import's own transaction; the next beat retries
+                        pass
+            finally:
+                # The thread has its own connection
+                connection.close()
+
+        thread = threading.Thread(target=run, name=f'import-job-{job.pk}-heartbeat', daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def run_job(self, job):
+        def progress(rows_parsed):
+            self.beat(job, rows_parsed=rows_parsed)
+
+        try:
+            with self.heartbeat(job), job.file.open('rb') as statement:
+                result = import_statement(job.user, statement, progress=progress)
+        except Exception as e:
+            job.status = 'FAILED'
+            job.errors = [str(e)]
+        else:
+            job.rows_parsed = result['rows_parsed']
+            job.trades_created = result['trades_created']
+            job.duplicates_skipped = result['duplicates_skipped']
+            job.executions_skipped = result['executions_skipped']
+            job.duplicate_statement = result['duplicate_statement']
+            job.errors = result['errors']
+            parsed = result['rows_parsed'] or result['duplicate_statement']
+            job.status = 'COMPLETED' if parsed else 'FAILED'
+        job.finished_at = timezone.now()
+        job.heartbeat_at = job.finished_at
+        # The statement is not needed once its result is recorded
+        job.file.delete(save=False)
+        job.save()
+        return job
+
+    def run_once(self):
+        """Run a single pending job; returns it, or None if the queue is empty."""
+        self.requeue_stale()
+        job = self.claim_next()
+        if job is not None:
+            self.run_job(job)
+        return job
+
+    def run_forever(self):
+        while True:
+            if self.run_once() is None:
+                time.sleep(self.poll_interval)